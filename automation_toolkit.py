@@ -10,11 +10,30 @@ import sys
 import logging
 import subprocess
 import json
+import hashlib
+import fnmatch
+import re
+import pwd
+import gzip
+import lzma
+import tarfile
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import fcntl
+import sqlite3
+import stat
 import time
 import shutil
+import heapq
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterator, NamedTuple, Callable, Tuple
 
 # ============================================================================
 # LOGGING CONFIGURATION
@@ -51,6 +70,1682 @@ class AutomationLogger:
 
 print("Logger configured")
 
+# ============================================================================
+# PATH FILTERS
+# ============================================================================
+
+def _path_parts(path: str) -> List[str]:
+    """Split an absolute path into its components"""
+    return [part for part in os.path.abspath(path).split(os.sep) if part]
+
+
+class _PrefixTrie:
+    """Trie over path components mapping directory prefixes to values"""
+    
+    def __init__(self):
+        self.root: Dict = {}
+    
+    def insert(self, path: str, value) -> None:
+        node = self.root
+        for part in _path_parts(path):
+            node = node.setdefault(part, {})
+        node.setdefault(None, []).append(value)
+    
+    def collect(self, path: str) -> List:
+        """Values stored at path or at any of its ancestors"""
+        node = self.root
+        found = list(node.get(None, ()))
+        for part in _path_parts(path):
+            node = node.get(part)
+            if node is None:
+                break
+            found.extend(node.get(None, ()))
+        return found
+    
+    def reaches(self, path: str) -> bool:
+        """True if any value is stored at, above or below path"""
+        node = self.root
+        for part in _path_parts(path):
+            if None in node:
+                return True
+            node = node.get(part)
+            if node is None:
+                return False
+        return bool(node)
+
+
+class _PatternSet:
+    """A list of path patterns compiled into a prefix trie, a name set and two combined regexes"""
+    
+    def __init__(self, patterns: List[str]):
+        self.trie = _PrefixTrie()
+        self.has_prefixes = False
+        self.names = set()
+        name_globs, path_globs = [], []
+        for pattern in patterns:
+            wildcard = any(c in pattern for c in '*?[')
+            if '/' not in pattern:
+                (name_globs.append if wildcard else self.names.add)(pattern)
+            elif pattern.startswith('/') and not wildcard:
+                self.trie.insert(pattern, True)
+                self.has_prefixes = True
+            else:
+                path_globs.append(pattern)
+        self.name_regex = self._combine(name_globs)
+        self.path_regex = self._combine(path_globs)
+    
+    @staticmethod
+    def _combine(globs: List[str]):
+        if not globs:
+            return None
+        return re.compile('|'.join(f"(?:{fnmatch.translate(glob)})" for glob in globs))
+    
+    def matches(self, path: str, name: str) -> bool:
+        return (name in self.names
+                or (self.name_regex is not None and self.name_regex.match(name) is not None)
+                or (self.path_regex is not None and self.path_regex.match(path) is not None)
+                or (self.has_prefixes and bool(self.trie.collect(path))))
+
+
+class PathFilter:
+    """
+    Compiled exclude/include filter shared by every FileManager scan.
+    
+    Patterns without '/' match entry names (literal names are a set lookup,
+    globs such as '*.pyc' share one combined regex). Absolute patterns
+    without wildcards are path prefixes held in a trie. Any other pattern
+    is an fnmatch glob against the absolute path, e.g. '*/customers/*'.
+    An excluded directory is pruned before it is listed. When includes are
+    given, only files matching one of them are yielded; directories are
+    still descended into unless excluded.
+    """
+    
+    def __init__(self, excludes: Optional[List[str]] = None, includes: Optional[List[str]] = None):
+        self.excludes = _PatternSet([os.path.normpath(p) if p.startswith('/') else p for p in excludes or []])
+        self.includes = _PatternSet(includes) if includes else None
+    
+    @classmethod
+    def load(cls, filter_path: str, excludes: Optional[List[str]] = None) -> 'PathFilter':
+        """Load one pattern per line ('#' starts a comment, a leading '!' marks an include), plus excludes"""
+        excludes, includes = list(excludes or []), []
+        with open(filter_path) as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                if line.startswith('!'):
+                    includes.append(line[1:])
+                else:
+                    excludes.append(line)
+        return cls(excludes, includes)
+    
+    def allows(self, path: str, name: str, is_dir: bool) -> bool:
+        """Check one entry whose parent directory has already been allowed"""
+        if self.excludes.matches(path, name):
+            return False
+        return is_dir or self.includes is None or self.includes.matches(path, name)
+    
+    def allows_path(self, path: str, root: str) -> bool:
+        """
+        Check a file path from outside a walk of root (e.g. an index row),
+        testing its ancestors below root for exclusion as a walk would; root
+        and its own ancestors are never tested.
+        """
+        path = os.path.abspath(path)
+        root = os.path.abspath(root)
+        parent = os.path.dirname(path)
+        while parent != root and parent != os.path.dirname(parent):
+            if self.excludes.matches(parent, os.path.basename(parent)):
+                return False
+            parent = os.path.dirname(parent)
+        return self.allows(path, os.path.basename(path), False)
+
+class MountTable:
+    """Snapshot of /proc/self/mountinfo: mount points and the fs type behind each device number"""
+    
+    def __init__(self, mountinfo: str = '/proc/self/mountinfo'):
+        self.mounts: Dict[str, Tuple[int, str]] = {}
+        self.fstypes: Dict[int, str] = {}
+        try:
+            with open(mountinfo) as f:
+                for line in f:
+                    fields = line.split()
+                    separator = fields.index('-')
+                    major, minor = fields[2].split(':')
+                    dev = os.makedev(int(major), int(minor))
+                    fstype = fields[separator + 1]
+                    self.mounts[self._unescape(fields[4])] = (dev, fstype)
+                    self.fstypes[dev] = fstype
+        except (OSError, ValueError, IndexError):
+            pass
+    
+    @staticmethod
+    def _unescape(field: str) -> str:
+        """Decode the octal escapes (\\040 etc.) mountinfo uses for whitespace in paths"""
+        return re.sub(r'\\([0-7]{3})', lambda m: chr(int(m.group(1), 8)), field)
+
+
+class FilesystemBoundary:
+    """
+    Mount-boundary pruning for tree walks, driven by one MountTable read.
+    
+    Each directory's st_dev is compared with the walk root's: with
+    one_filesystem=True (find -xdev) directories on another device, and
+    mount points of the same device such as bind mounts, are not entered.
+    Directories whose device belongs to a filesystem type in skip_fstypes
+    (PSEUDO_FSTYPES by default; add NETWORK_FSTYPES to keep off remote
+    mounts) are never entered either way.
+    """
+    
+    PSEUDO_FSTYPES = frozenset({
+        'proc', 'sysfs', 'devtmpfs', 'devpts', 'cgroup', 'cgroup2', 'debugfs', 'tracefs', 'securityfs',
+        'pstore', 'bpf', 'configfs', 'fusectl', 'mqueue', 'hugetlbfs', 'binfmt_misc', 'efivarfs', 'autofs',
+        'rpc_pipefs', 'nsfs'})
+    NETWORK_FSTYPES = frozenset({'nfs', 'nfs4', 'cifs', 'smb3', 'ceph', 'fuse.sshfs', 'glusterfs', '9p'})
+    
+    def __init__(self, one_filesystem: bool = False, skip_fstypes: Optional[set] = None,
+                 mounts: Optional[MountTable] = None):
+        self.one_filesystem = one_filesystem
+        self.skip_fstypes = frozenset(self.PSEUDO_FSTYPES if skip_fstypes is None else skip_fstypes)
+        self.mounts = mounts if mounts is not None else MountTable()
+    
+    @staticmethod
+    def root_device(root) -> Optional[int]:
+        try:
+            return os.stat(root).st_dev
+        except OSError:
+            return None
+    
+    def allows_dir(self, path: str, st: os.stat_result, root_dev: Optional[int]) -> bool:
+        """Check a (non-symlink) directory found during a walk of a root on root_dev"""
+        if self.mounts.fstypes.get(st.st_dev) in self.skip_fstypes:
+            return False
+        if self.one_filesystem and root_dev is not None:
+            return st.st_dev == root_dev and os.path.abspath(path) not in self.mounts.mounts
+        return True
+
+# ============================================================================
+# TREE WALKING ENGINE
+# ============================================================================
+
+class WalkEntry(NamedTuple):
+    """Compact record for one directory entry yielded by TreeWalker"""
+    path: str
+    name: str
+    is_dir: bool
+    is_file: bool
+    is_symlink: bool
+    stat: Optional[os.stat_result]
+    
+    @property
+    def size(self) -> int:
+        return self.stat.st_size if self.stat is not None else 0
+    
+    @property
+    def mtime(self) -> float:
+        return self.stat.st_mtime if self.stat is not None else 0.0
+
+
+class _WalkFrame:
+    """One open directory on the TreeWalker depth-first stack"""
+    __slots__ = ('path', 'iterator', 'remaining')
+    
+    def __init__(self, path: str, iterator):
+        self.path = path
+        self.iterator = iterator
+        self.remaining = 0
+
+
+class TreeWalker:
+    """
+    Iterative os.scandir-based tree walker shared by all FileManager scans.
+    
+    File type comes from the DirEntry d_type, so no syscall is needed to
+    classify an entry, and at most one stat per file is issued (cached on the
+    DirEntry). Symlinked directories are never descended into, and
+    directories listed in skip_dirs are neither yielded nor descended into.
+    Entries rejected by path_filter are dropped before they are stat'ed.
+    With a boundary, every directory is lstat'ed and those on another
+    filesystem (as the boundary decides) are dropped.
+    """
+    
+    def __init__(self, logger: logging.Logger, stat_files: bool = True, stat_dirs: bool = False,
+                 skip_dirs: Optional[set] = None, path_filter: Optional[PathFilter] = None,
+                 boundary: Optional[FilesystemBoundary] = None):
+        self.logger = logger
+        self.stat_files = stat_files
+        self.stat_dirs = stat_dirs
+        self.skip_dirs = skip_dirs or set()
+        self.path_filter = path_filter
+        self.boundary = boundary
+        self._root_dev: Optional[int] = None
+        self._root_pinned = False
+        self.dirs_scanned = 0
+        self.entries_seen = 0
+        self.stat_calls = 0
+        self.errors = 0
+        self._stack: List[_WalkFrame] = []
+        self._skip_descend = False
+    
+    def walk(self, root: str, on_dir_exit: Optional[Callable[[str, int], bool]] = None) -> Iterator[WalkEntry]:
+        """
+        Yield a WalkEntry for every entry below root (root itself excluded).
+        
+        Traversal is depth-first with one open directory handle per level.
+        When given, on_dir_exit(path, remaining) is called post-order for
+        every directory (root included) once it and all of its subdirectories
+        are finished; remaining is the number of entries it still holds.
+        Returning True tells the walker the directory was removed.
+        """
+        self._stack = []
+        if self.boundary is not None and not self._root_pinned:
+            self._root_dev = self.boundary.root_device(root)
+        self._push(os.fspath(root))
+        try:
+            while self._stack:
+                frame = self._stack[-1]
+                record = self._next_entry(frame)
+                if record is None:
+                    self._stack.pop()
+                    frame.iterator.close()
+                    if on_dir_exit is not None and on_dir_exit(frame.path, frame.remaining) and self._stack:
+                        self._stack[-1].remaining -= 1
+                    continue
+                self._skip_descend = False
+                yield record
+                if record.is_dir and not record.is_symlink and not self._skip_descend:
+                    self._push(record.path)
+        finally:
+            for frame in self._stack:
+                frame.iterator.close()
+            self._stack = []
+    
+    @property
+    def current_dir(self) -> Optional[str]:
+        """Directory that the most recently yielded entry belongs to"""
+        return self._stack[-1].path if self._stack else None
+    
+    def discard(self) -> None:
+        """Tell the walker the last yielded entry was removed from disk"""
+        if self._stack:
+            self._stack[-1].remaining -= 1
+        self._skip_descend = True
+    
+    def prune(self) -> None:
+        """Do not descend into the last yielded directory"""
+        self._skip_descend = True
+    
+    def set_root(self, root: str) -> None:
+        """Pin the root whose filesystem later scan_dir() calls are checked against"""
+        if self.boundary is not None:
+            self._root_dev = self.boundary.root_device(root)
+            self._root_pinned = True
+    
+    def admits_dir(self, dir_path: str, st: Optional[os.stat_result] = None) -> bool:
+        """
+        Apply skip_dirs, path_filter and boundary to a directory known only
+        by path (e.g. from an index), as if it had been found by a walk.
+        """
+        if dir_path in self.skip_dirs:
+            return False
+        if self.path_filter is not None and not self.path_filter.allows(dir_path, os.path.basename(dir_path), True):
+            return False
+        if self.boundary is not None:
+            try:
+                st = st if st is not None else os.lstat(dir_path)
+            except OSError:
+                return False
+            return self.boundary.allows_dir(dir_path, st, self._root_dev)
+        return True
+    
+    def scan_dir(self, dir_path: str) -> Iterator[WalkEntry]:
+        """Yield a WalkEntry for every entry directly inside dir_path"""
+        if self.boundary is not None and not self._stack and not self._root_pinned:
+            self._root_dev = self.boundary.root_device(dir_path)
+        try:
+            it = os.scandir(dir_path)
+        except OSError as e:
+            self.errors += 1
+            self.logger.warning(f"Could not scan {dir_path}: {e}")
+            return
+        self.dirs_scanned += 1
+        with it:
+            for entry in it:
+                self.entries_seen += 1
+                record = self._make_entry(entry)
+                if record is not None:
+                    yield record
+    
+    def _push(self, dir_path: str) -> None:
+        try:
+            it = os.scandir(dir_path)
+        except OSError as e:
+            self.errors += 1
+            self.logger.warning(f"Could not scan {dir_path}: {e}")
+            return
+        self.dirs_scanned += 1
+        self._stack.append(_WalkFrame(dir_path, it))
+    
+    def _next_entry(self, frame: _WalkFrame) -> Optional[WalkEntry]:
+        """Return the next record from frame, or None once it is exhausted"""
+        while True:
+            try:
+                entry = next(frame.iterator, None)
+            except OSError as e:
+                self.errors += 1
+                self.logger.warning(f"Could not read {frame.path}: {e}")
+                return None
+            if entry is None:
+                return None
+            self.entries_seen += 1
+            frame.remaining += 1
+            record = self._make_entry(entry)
+            if record is not None:
+                return record
+    
+    def _make_entry(self, entry: os.DirEntry) -> Optional[WalkEntry]:
+        try:
+            is_symlink = entry.is_symlink()
+            is_dir = entry.is_dir()
+            if is_dir and entry.path in self.skip_dirs:
+                return None
+            if self.path_filter is not None and not self.path_filter.allows(entry.path, entry.name, is_dir):
+                return None
+            is_file = not is_dir and entry.is_file()
+            st = None
+            if is_dir and not is_symlink and self.boundary is not None:
+                self.stat_calls += 1
+                st = entry.stat(follow_symlinks=False)
+                if not self.boundary.allows_dir(entry.path, st, self._root_dev):
+                    return None
+            elif (is_file and self.stat_files) or (is_dir and self.stat_dirs):
+                self.stat_calls += 1
+                st = entry.stat()
+        except OSError as e:
+            self.errors += 1
+            self.logger.warning(f"Could not stat {entry.path}: {e}")
+            return None
+        return WalkEntry(entry.path, entry.name, is_dir, is_file, is_symlink, st)
+
+class ParallelTreeWalker(TreeWalker):
+    """
+    Thread-pool TreeWalker for high-latency filesystems (NFS, CephFS).
+    
+    Directory listings and stat batches run on worker threads so many
+    readdir/stat round trips are in flight at once. Entries are yielded in
+    completion order: the set of entries matches the serial walk, the order
+    does not. Post-order callbacks are not supported.
+    """
+    
+    STAT_BATCH = 256
+    
+    def __init__(self, logger: logging.Logger, workers: int = 8, stat_files: bool = True, stat_dirs: bool = False,
+                 skip_dirs: Optional[set] = None, path_filter: Optional[PathFilter] = None,
+                 boundary: Optional[FilesystemBoundary] = None):
+        super().__init__(logger, stat_files=stat_files, stat_dirs=stat_dirs, skip_dirs=skip_dirs,
+                         path_filter=path_filter, boundary=boundary)
+        self.workers = max(1, workers)
+        self._lock = threading.Lock()
+    
+    def walk(self, root: str, on_dir_exit: Optional[Callable[[str, int], bool]] = None) -> Iterator[WalkEntry]:
+        """Yield a WalkEntry for every entry below root, scanning directories concurrently"""
+        if on_dir_exit is not None:
+            raise ValueError("ParallelTreeWalker does not support post-order callbacks")
+        if self.boundary is not None and not self._root_pinned:
+            self._root_dev = self.boundary.root_device(root)
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='tree-walker')
+        try:
+            pending = {pool.submit(self._scan_task, os.fspath(root))}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    records, batches = future.result()
+                    for batch in batches:
+                        pending.add(pool.submit(self._stat_task, batch))
+                    for record in records:
+                        self._skip_descend = False
+                        yield record
+                        if record.is_dir and not record.is_symlink and not self._skip_descend:
+                            pending.add(pool.submit(self._scan_task, record.path))
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+    
+    def _count(self, dirs: int = 0, seen: int = 0, stats: int = 0, errors: int = 0) -> None:
+        with self._lock:
+            self.dirs_scanned += dirs
+            self.entries_seen += seen
+            self.stat_calls += stats
+            self.errors += errors
+    
+    def _scan_task(self, dir_path: str):
+        """List one directory; stat work beyond the first batch is returned for other workers"""
+        records, to_stat = [], []
+        seen = errors = stats = 0
+        try:
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    seen += 1
+                    try:
+                        is_symlink = entry.is_symlink()
+                        is_dir = entry.is_dir()
+                        is_file = not is_dir and entry.is_file()
+                    except OSError as e:
+                        errors += 1
+                        self.logger.warning(f"Could not stat {entry.path}: {e}")
+                        continue
+                    if is_dir and entry.path in self.skip_dirs:
+                        continue
+                    if self.path_filter is not None and not self.path_filter.allows(entry.path, entry.name, is_dir):
+                        continue
+                    if is_dir and not is_symlink and self.boundary is not None:
+                        stats += 1
+                        try:
+                            st = entry.stat(follow_symlinks=False)
+                        except OSError as e:
+                            errors += 1
+                            self.logger.warning(f"Could not stat {entry.path}: {e}")
+                            continue
+                        if self.boundary.allows_dir(entry.path, st, self._root_dev):
+                            records.append(WalkEntry(entry.path, entry.name, True, False, False, st))
+                    elif (is_file and self.stat_files) or (is_dir and self.stat_dirs):
+                        to_stat.append(entry)
+                    else:
+                        records.append(WalkEntry(entry.path, entry.name, is_dir, is_file, is_symlink, None))
+        except OSError as e:
+            self._count(errors=errors + 1, seen=seen, stats=stats)
+            self.logger.warning(f"Could not scan {dir_path}: {e}")
+            return records, []
+        self._count(dirs=1, seen=seen, stats=stats, errors=errors)
+        batches = [to_stat[i:i + self.STAT_BATCH] for i in range(0, len(to_stat), self.STAT_BATCH)]
+        if batches:
+            records.extend(self._stat_task(batches.pop(0))[0])
+        return records, batches
+    
+    def _stat_task(self, entries: List[os.DirEntry]):
+        """Stat a batch of DirEntry objects into WalkEntry records"""
+        records = []
+        errors = 0
+        for entry in entries:
+            try:
+                st = entry.stat()
+                is_dir = stat.S_ISDIR(st.st_mode)
+                records.append(WalkEntry(entry.path, entry.name, is_dir, not is_dir and stat.S_ISREG(st.st_mode),
+                                         entry.is_symlink(), st))
+            except OSError as e:
+                errors += 1
+                self.logger.warning(f"Could not stat {entry.path}: {e}")
+        self._count(stats=len(entries), errors=errors)
+        return records, []
+
+def scan_shard(shard_root: str, recursive: bool, op: str, threshold: float, logger_name: str,
+               limit: int = 0, path_filter: Optional[PathFilter] = None,
+               boundary: Optional[FilesystemBoundary] = None) -> Dict:
+    """
+    Process-pool worker for FileManager sharded scans.
+    
+    Walks shard_root (only its direct files when recursive is False) and
+    applies op: 'large' collects (path, size) for files above threshold
+    bytes, 'old' deletes files with mtime below threshold and collects their
+    names. Returns a compact summary instead of per-file dicts; with a
+    limit, 'large' keeps only the limit largest matches.
+    """
+    logger = logging.getLogger(logger_name)
+    walker = TreeWalker(logger, path_filter=path_filter, boundary=boundary)
+    summary = {'count': 0, 'errors': 0, 'items': []}
+    heap = []
+    entries = walker.walk(shard_root) if recursive else walker.scan_dir(shard_root)
+    for entry in entries:
+        if not entry.is_file:
+            continue
+        if op == 'large' and entry.size > threshold:
+            summary['count'] += 1
+            if not limit:
+                summary['items'].append((entry.path, entry.size))
+            elif len(heap) < limit:
+                heapq.heappush(heap, (entry.size, entry.path))
+            else:
+                heapq.heappushpop(heap, (entry.size, entry.path))
+            logger.info(f"Found large file: {entry.name} ({entry.size / (1024 * 1024):.2f}MB)")
+        elif op == 'old' and entry.mtime < threshold:
+            try:
+                os.unlink(entry.path)
+                summary['count'] += 1
+                summary['items'].append(entry.name)
+                logger.info(f"Deleted old file: {entry.path}")
+            except Exception as e:
+                summary['errors'] += 1
+                logger.warning(f"Could not delete {entry.path}: {e}")
+    if heap:
+        summary['items'] = [(path, size) for size, path in heap]
+    return summary
+
+def compress_chunk(data: bytes, compression: str, level: int) -> bytes:
+    """Process-pool worker: compress one chunk as a standalone gzip member or xz stream"""
+    if compression == 'xz':
+        return lzma.compress(data, preset=level)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+class _ChunkCompressor:
+    """Write-only file object that compresses fixed-size chunks in parallel and writes them in order"""
+    
+    def __init__(self, out, pool: ProcessPoolExecutor, compression: str, level: int, chunk_bytes: int,
+                 max_in_flight: int):
+        self.out = out
+        self.pool = pool
+        self.compression = compression
+        self.level = level
+        self.chunk_bytes = chunk_bytes
+        self.max_in_flight = max_in_flight
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._buffer = bytearray()
+        self._pending = deque()
+    
+    def write(self, data) -> int:
+        self._buffer += data
+        while len(self._buffer) >= self.chunk_bytes:
+            self._submit(bytes(self._buffer[:self.chunk_bytes]))
+            del self._buffer[:self.chunk_bytes]
+        return len(data)
+    
+    def close(self) -> None:
+        if self._buffer:
+            self._submit(bytes(self._buffer))
+            self._buffer.clear()
+        while self._pending:
+            self._write_next()
+    
+    def _submit(self, chunk: bytes) -> None:
+        self.bytes_in += len(chunk)
+        self._pending.append(self.pool.submit(compress_chunk, chunk, self.compression, self.level))
+        while len(self._pending) >= self.max_in_flight:
+            self._write_next()
+    
+    def _write_next(self) -> None:
+        compressed = self._pending.popleft().result()
+        self.out.write(compressed)
+        self.bytes_out += len(compressed)
+
+# ============================================================================
+# METADATA INDEX
+# ============================================================================
+
+class MetadataIndex:
+    """
+    Persistent SQLite index of file metadata (path, inode, size, mtime, mode).
+    
+    refresh() re-lists only directories whose mtime changed since the last
+    run; unchanged directories are not listed again and their indexed
+    subdirectories are visited from the index. A directory mtime only
+    changes when entries are added, removed or renamed, so the indexed files
+    of an unchanged directory are re-stat'ed instead (no readdir) to pick up
+    files that grew, shrank or were touched in place.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY,
+            parent TEXT NOT NULL,
+            dev INTEGER, ino INTEGER, size INTEGER, mtime REAL, mode INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS files_parent ON files(parent);
+        CREATE INDEX IF NOT EXISTS files_mtime ON files(mtime);
+        CREATE INDEX IF NOT EXISTS files_size ON files(size);
+        CREATE TABLE IF NOT EXISTS dirs (
+            path TEXT PRIMARY KEY,
+            parent TEXT NOT NULL,
+            mtime_ns INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS dirs_parent ON dirs(parent);
+    """
+    
+    def __init__(self, db_path: str, logger: logging.Logger):
+        self.db_path = db_path
+        self.logger = logger
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+    
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+    
+    @staticmethod
+    def _subtree_bounds(root: str) -> Tuple[str, str]:
+        """Key range covering every path strictly below root ('0' sorts right after '/')"""
+        prefix = root.rstrip('/') + '/'
+        return prefix, prefix[:-1] + '0'
+    
+    def refresh(self, root: str, full: bool = False, walker: Optional[TreeWalker] = None) -> Dict:
+        """
+        Bring the index for root up to date, re-listing only changed
+        directories and re-stat'ing the indexed files of unchanged ones. A
+        serial walker carrying the caller's skip_dirs,
+        path_filter and boundary (pinned with set_root) decides which
+        directories are indexed; subtrees it rejects are dropped from the
+        index, including ones that are only known from an earlier run.
+        """
+        root = os.path.abspath(root)
+        stats = {'dirs_scanned': 0, 'dirs_skipped': 0, 'files_indexed': 0, 'files_updated': 0, 'removed': 0}
+        if walker is None:
+            walker = TreeWalker(self.logger)
+            walker.set_root(root)
+        stack = [root]
+        with self._lock:
+            while stack:
+                dir_path = stack.pop()
+                try:
+                    dir_st = os.stat(dir_path)
+                except OSError:
+                    stats['removed'] += self.forget_tree(dir_path)
+                    continue
+                if dir_path != root and not walker.admits_dir(dir_path, dir_st):
+                    stats['removed'] += self.forget_tree(dir_path)
+                    continue
+                dir_mtime = dir_st.st_mtime_ns
+                row = self.conn.execute("SELECT mtime_ns FROM dirs WHERE path = ?", (dir_path,)).fetchone()
+                if not full and row is not None and row[0] == dir_mtime:
+                    stats['dirs_skipped'] += 1
+                    updated, removed = self._restat_files(dir_path)
+                    stats['files_updated'] += updated
+                    stats['removed'] += removed
+                    stack.extend(r[0] for r in self.conn.execute("SELECT path FROM dirs WHERE parent = ?", (dir_path,)))
+                    continue
+                stats['dirs_scanned'] += 1
+                files, subdirs = [], []
+                for entry in walker.scan_dir(dir_path):
+                    if entry.is_dir and not entry.is_symlink:
+                        subdirs.append(entry.path)
+                    elif entry.is_file:
+                        files.append(entry)
+                stats['removed'] += self._forget_vanished(dir_path, {e.path for e in files}, set(subdirs))
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO files (path, parent, dev, ino, size, mtime, mode) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(e.path, dir_path, e.stat.st_dev, e.stat.st_ino, e.stat.st_size, e.stat.st_mtime, e.stat.st_mode)
+                     for e in files])
+                self.conn.execute("INSERT OR REPLACE INTO dirs (path, parent, mtime_ns) VALUES (?, ?, ?)",
+                                  (dir_path, os.path.dirname(dir_path), dir_mtime))
+                stats['files_indexed'] += len(files)
+                stack.extend(subdirs)
+            self.conn.commit()
+        self.logger.info(f"Index refresh of {root}: {stats['dirs_scanned']} dirs scanned, "
+                         f"{stats['dirs_skipped']} unchanged, {stats['files_indexed']} files indexed, "
+                         f"{stats['files_updated']} updated in place")
+        return stats
+    
+    def _restat_files(self, dir_path: str) -> Tuple[int, int]:
+        """Re-stat the indexed files of an unchanged directory; returns (updated, removed)"""
+        updated, gone = [], []
+        for path, ino, size, mtime in self.conn.execute(
+                "SELECT path, ino, size, mtime FROM files WHERE parent = ?", (dir_path,)).fetchall():
+            try:
+                st = os.stat(path)
+            except OSError:
+                gone.append((path,))
+                continue
+            if (st.st_ino, st.st_size, st.st_mtime) != (ino, size, mtime):
+                updated.append((st.st_dev, st.st_ino, st.st_size, st.st_mtime, st.st_mode, path))
+        self.conn.executemany("UPDATE files SET dev = ?, ino = ?, size = ?, mtime = ?, mode = ? WHERE path = ?",
+                              updated)
+        self.conn.executemany("DELETE FROM files WHERE path = ?", gone)
+        return len(updated), len(gone)
+    
+    def _forget_vanished(self, dir_path: str, files: set, subdirs: set) -> int:
+        removed = 0
+        gone = [r[0] for r in self.conn.execute("SELECT path FROM files WHERE parent = ?", (dir_path,))
+                if r[0] not in files]
+        self.conn.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in gone])
+        removed += len(gone)
+        for (path,) in self.conn.execute("SELECT path FROM dirs WHERE parent = ?", (dir_path,)).fetchall():
+            if path not in subdirs:
+                removed += self.forget_tree(path)
+        return removed
+    
+    def forget_tree(self, dir_path: str) -> int:
+        """Drop a directory and everything indexed below it"""
+        low, high = self._subtree_bounds(dir_path)
+        with self._lock:
+            cur = self.conn.execute("DELETE FROM files WHERE path > ? AND path < ?", (low, high))
+            removed = cur.rowcount
+            self.conn.execute("DELETE FROM dirs WHERE path = ? OR (path > ? AND path < ?)", (dir_path, low, high))
+        return removed
+    
+    def update_file(self, path: str, st: os.stat_result) -> None:
+        """Insert or refresh one file record"""
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO files (path, parent, dev, ino, size, mtime, mode) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (path, os.path.dirname(path), st.st_dev, st.st_ino, st.st_size, st.st_mtime, st.st_mode))
+    
+    def remove_file(self, path: str) -> None:
+        """Drop one file record"""
+        with self._lock:
+            self.conn.execute("DELETE FROM files WHERE path = ?", (path,))
+    
+    def commit(self) -> None:
+        with self._lock:
+            self.conn.commit()
+    
+    def query_old_files(self, root: str, cutoff_time: float) -> List[Tuple[str, int, float]]:
+        """Return (path, size, mtime) for indexed files under root older than cutoff_time"""
+        low, high = self._subtree_bounds(os.path.abspath(root))
+        with self._lock:
+            return self.conn.execute(
+                "SELECT path, size, mtime FROM files WHERE path > ? AND path < ? AND mtime < ?",
+                (low, high, cutoff_time)).fetchall()
+    
+    def query_large_files(self, root: str, min_size: int) -> List[Tuple[str, int, float]]:
+        """Return (path, size, mtime) for indexed files under root larger than min_size bytes"""
+        low, high = self._subtree_bounds(os.path.abspath(root))
+        with self._lock:
+            return self.conn.execute(
+                "SELECT path, size, mtime FROM files WHERE path > ? AND path < ? AND size > ?",
+                (low, high, min_size)).fetchall()
+    
+    def iter_files_ordered(self, root: str, cutoff_time: float, order: str = 'age',
+                           batch: int = 1024) -> Iterator[Tuple[str, int, float]]:
+        """
+        Yield (path, size, mtime) for indexed files under root older than
+        cutoff_time, oldest first (order='age') or largest first
+        (order='size'), paging through the index so callers can stop early.
+        """
+        low, high = self._subtree_bounds(os.path.abspath(root))
+        if order == 'size':
+            sql = ("SELECT path, size, mtime FROM files WHERE path > ? AND path < ? AND mtime < ? "
+                   "AND (size < ? OR (size = ? AND path > ?)) ORDER BY size DESC, path LIMIT ?")
+            key = (float('inf'), float('inf'), '')
+        else:
+            sql = ("SELECT path, size, mtime FROM files WHERE path > ? AND path < ? AND mtime < ? "
+                   "AND (mtime, path) > (?, ?) ORDER BY mtime, path LIMIT ?")
+            key = (float('-inf'), '')
+        while True:
+            with self._lock:
+                rows = self.conn.execute(sql, (low, high, cutoff_time) + key + (batch,)).fetchall()
+            if not rows:
+                return
+            yield from rows
+            path, size, mtime = rows[-1]
+            key = (size, size, path) if order == 'size' else (mtime, path)
+
+class IndexWatcher:
+    """
+    inotify-driven watcher that keeps a MetadataIndex current for one tree.
+    
+    Every directory under root gets an inotify watch (via ctypes) and file
+    creations, modifications, moves and deletions are applied to the index
+    as they happen, so FileManager queries need no traversal. Directories
+    that cannot be watched (watch limit exhausted, permissions) are rescanned
+    on every sync(), and a queue overflow triggers a rescan of the whole
+    root. Both rescans are full (every directory re-listed, every file
+    re-stat'ed), since the events they stand in for were never delivered.
+    skip_dirs, path_filter and
+    boundary are applied to every watch and rescan, as in FileManager
+    scans, so excluded or foreign subtrees are neither watched nor indexed.
+    """
+    
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    
+    WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+                  IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+    EVENT_HEADER = struct.Struct('iIII')
+    READ_SIZE = 256 * 1024
+    
+    def __init__(self, root: str, index: MetadataIndex, logger: logging.Logger,
+                 path_filter: Optional[PathFilter] = None, boundary: Optional[FilesystemBoundary] = None,
+                 skip_dirs: Optional[set] = None):
+        self.root = os.path.abspath(root)
+        self.index = index
+        self.logger = logger
+        self.path_filter = path_filter
+        self.boundary = boundary
+        self.skip_dirs = set(skip_dirs or ())
+        self.wd_paths: Dict[int, str] = {}
+        self.unwatched: set = set()
+        self.needs_full_rescan = False
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        if not hasattr(self._libc, 'inotify_init1'):
+            raise OSError("inotify is not available on this platform")
+        self._libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_init1 failed: {os.strerror(err)}")
+        
+        self.index.refresh(self.root, walker=self._new_walker())
+        self._watch_tree(self.root)
+        self.logger.info(f"Watching {self.root}: {len(self.wd_paths)} directories, {len(self.unwatched)} unwatched")
+    
+    def covers(self, path: str) -> bool:
+        """Whether path lies inside the watched tree"""
+        path = os.path.abspath(path)
+        return path == self.root or path.startswith(self.root.rstrip('/') + '/')
+    
+    def start(self) -> None:
+        """Process events on a background thread until stop() is called"""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='index-watcher', daemon=True)
+            self._thread.start()
+    
+    def stop(self) -> None:
+        """Stop the background thread and release all watches"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            if self.fd >= 0:
+                os.close(self.fd)
+                self.fd = -1
+        self.index.commit()
+    
+    def sync(self) -> Dict:
+        """Apply pending events and rescan any subtrees that events cannot cover"""
+        with self._lock:
+            stats = {'events': self._drain(), 'rescanned': 0}
+            if self.needs_full_rescan:
+                self.logger.warning(f"inotify queue overflowed, rescanning {self.root}")
+                self.needs_full_rescan = False
+                self.index.refresh(self.root, full=True, walker=self._new_walker())
+                self._watch_tree(self.root)
+                stats['rescanned'] += 1
+            for dir_path in list(self.unwatched):
+                self.unwatched.discard(dir_path)
+                if os.path.isdir(dir_path):
+                    self.index.refresh(dir_path, full=True, walker=self._new_walker())
+                    self._watch_tree(dir_path)
+                    stats['rescanned'] += 1
+                else:
+                    self.index.forget_tree(dir_path)
+            self.index.commit()
+        return stats
+    
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                ready, _, _ = select.select([self.fd], [], [], 0.5)
+            except (OSError, ValueError):
+                break
+            if ready:
+                self.sync()
+    
+    def _new_walker(self, stat_files: bool = True) -> TreeWalker:
+        """Serial walker applying this watcher's exclusions, pinned to its root filesystem"""
+        walker = TreeWalker(self.logger, stat_files=stat_files, skip_dirs=set(self.skip_dirs),
+                            path_filter=self.path_filter, boundary=self.boundary)
+        walker.set_root(self.root)
+        return walker
+    
+    def _watch_tree(self, top: str) -> None:
+        """Add watches for top and every directory below it"""
+        walker = self._new_walker(stat_files=False)
+        if top != self.root and not walker.admits_dir(top):
+            return
+        if not self._add_watch(top):
+            return
+        for entry in walker.walk(top):
+            if entry.is_dir and not entry.is_symlink and not self._add_watch(entry.path):
+                walker.prune()
+    
+    def _add_watch(self, dir_path: str) -> bool:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(dir_path), self.WATCH_MASK)
+        if wd >= 0:
+            self.wd_paths[wd] = dir_path
+            return True
+        err = ctypes.get_errno()
+        if err == errno.ENOSPC:
+            self.logger.warning(f"inotify watch limit reached, {dir_path} will be rescanned on sync")
+        else:
+            self.logger.warning(f"Could not watch {dir_path}: {os.strerror(err)}")
+        if err != errno.ENOENT:
+            self.unwatched.add(dir_path)
+        return False
+    
+    def _unwatch_tree(self, dir_path: str) -> None:
+        prefix = dir_path.rstrip('/') + '/'
+        for wd, path in list(self.wd_paths.items()):
+            if path == dir_path or path.startswith(prefix):
+                self._libc.inotify_rm_watch(self.fd, wd)
+                del self.wd_paths[wd]
+    
+    def _drain(self) -> int:
+        """Read and apply every queued event; returns the number handled"""
+        handled = 0
+        while True:
+            try:
+                buf = os.read(self.fd, self.READ_SIZE)
+            except BlockingIOError:
+                return handled
+            except OSError as e:
+                self.logger.error(f"inotify read failed: {e}")
+                return handled
+            offset = 0
+            while offset < len(buf):
+                wd, mask, _, name_len = self.EVENT_HEADER.unpack_from(buf, offset)
+                offset += self.EVENT_HEADER.size
+                name = os.fsdecode(buf[offset:offset + name_len].rstrip(b'\0'))
+                offset += name_len
+                self._handle_event(wd, mask, name)
+                handled += 1
+    
+    def _handle_event(self, wd: int, mask: int, name: str) -> None:
+        if mask & self.IN_Q_OVERFLOW:
+            self.needs_full_rescan = True
+            return
+        dir_path = self.wd_paths.get(wd)
+        if dir_path is None:
+            return
+        if mask & self.IN_IGNORED:
+            del self.wd_paths[wd]
+            return
+        if mask & (self.IN_DELETE_SELF | self.IN_MOVE_SELF) or not name:
+            return
+        path = os.path.join(dir_path, name)
+        if mask & self.IN_ISDIR:
+            if mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                self._unwatch_tree(path)
+                self.index.forget_tree(path)
+            elif mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                walker = self._new_walker()
+                if walker.admits_dir(path):
+                    self._watch_tree(path)
+                    self.index.refresh(path, walker=walker)
+            return
+        if self.path_filter is not None and not self.path_filter.allows(path, name, False):
+            return
+        if mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+            self.index.remove_file(path)
+            return
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.index.remove_file(path)
+            return
+        if stat.S_ISREG(st.st_mode):
+            self.index.update_file(path, st)
+        else:
+            self.index.remove_file(path)
+
+class HashCache:
+    """
+    Persistent content-hash cache keyed by (dev, inode, size, mtime_ns).
+    
+    Any change to a file's size or mtime produces a new key, so stale
+    digests are never returned. Entries carry a last-used stamp and the
+    least recently used are evicted once the cache exceeds max_entries.
+    Access is serialised with a lock inside a process, and SQLite WAL mode
+    with a busy timeout makes it safe to share between processes.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS hashes (
+            dev INTEGER, ino INTEGER, size INTEGER, mtime_ns INTEGER, kind TEXT,
+            digest TEXT NOT NULL,
+            last_used REAL NOT NULL,
+            PRIMARY KEY (dev, ino, size, mtime_ns, kind)
+        );
+        CREATE INDEX IF NOT EXISTS hashes_last_used ON hashes(last_used);
+    """
+    
+    def __init__(self, db_path: str, logger: logging.Logger, max_entries: int = 1000000):
+        self.db_path = db_path
+        self.logger = logger
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._pending_touch: List[Tuple] = []
+        self._inserts = 0
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+    
+    @staticmethod
+    def _key(st: os.stat_result, kind: str) -> Tuple:
+        return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, kind)
+    
+    def get(self, st: os.stat_result, kind: str) -> Optional[str]:
+        """Return the cached digest for an unchanged file, or None"""
+        key = self._key(st, kind)
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT digest FROM hashes WHERE dev = ? AND ino = ? AND size = ? AND mtime_ns = ? AND kind = ?",
+                key).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._pending_touch.append((time.time(),) + key)
+            return row[0]
+    
+    def put(self, st: os.stat_result, kind: str, digest: str) -> None:
+        """Store a digest for the file identity described by st"""
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO hashes (dev, ino, size, mtime_ns, kind, digest, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", self._key(st, kind) + (digest, time.time()))
+            self._inserts += 1
+    
+    def commit(self) -> None:
+        """Flush last-used stamps, evict least recently used entries over the bound and commit"""
+        with self._lock:
+            if self._pending_touch:
+                self.conn.executemany(
+                    "UPDATE hashes SET last_used = ? WHERE dev = ? AND ino = ? AND size = ? AND mtime_ns = ? AND kind = ?",
+                    self._pending_touch)
+                self._pending_touch = []
+            if self._inserts:
+                self._inserts = 0
+                count = self.conn.execute("SELECT COUNT(*) FROM hashes").fetchone()[0]
+                if count > self.max_entries:
+                    self.conn.execute(
+                        "DELETE FROM hashes WHERE rowid IN (SELECT rowid FROM hashes ORDER BY last_used LIMIT ?)",
+                        (count - self.max_entries,))
+                    self.logger.debug(f"Hash cache evicted {count - self.max_entries} entries")
+            self.conn.commit()
+    
+    def close(self) -> None:
+        self.commit()
+        with self._lock:
+            self.conn.close()
+
+# ============================================================================
+# FILE TRANSFER ENGINE
+# ============================================================================
+
+class FileTransfer:
+    """
+    Move/copy engine that avoids Python-level copies where the kernel can help.
+    
+    Copies try, in order: a reflink clone (FICLONE ioctl), os.copy_file_range,
+    os.sendfile, then a large-buffer read/write loop. Each step picks up at
+    the offset the previous one reached. Data lands in a temporary file that
+    is renamed into place once its mode, timestamps, xattrs and (when
+    permitted) ownership match the source. move_file tries os.rename first.
+    The method used for each file is returned and tallied in self.stats.
+    """
+    
+    FICLONE = 0x40049409
+    FALLBACK_ERRNOS = {errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP, errno.ENOTTY, errno.EBADF, errno.EPERM}
+    METHODS = ('rename', 'reflink', 'copy_file_range', 'sendfile', 'buffered')
+    
+    def __init__(self, logger: logging.Logger, chunk_bytes: int = 8 * 1024 * 1024):
+        self.logger = logger
+        self.chunk_bytes = chunk_bytes
+        self.stats = {method: 0 for method in self.METHODS}
+        self._lock = threading.Lock()
+    
+    def _count(self, method: str) -> str:
+        with self._lock:
+            self.stats[method] += 1
+        return method
+    
+    def move_file(self, src: str, dst: str) -> str:
+        """Move src to dst, copying across filesystems; returns the method used"""
+        try:
+            os.rename(src, dst)
+            return self._count('rename')
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+        method = self.copy_file(src, dst)
+        os.unlink(src)
+        return method
+    
+    def copy_file(self, src: str, dst: str) -> str:
+        """Copy src to dst with metadata; returns the method used"""
+        tmp = f"{dst}.partial-{os.getpid()}-{threading.get_ident()}"
+        try:
+            with open(src, 'rb') as fsrc, open(tmp, 'wb') as fdst:
+                src_st = os.fstat(fsrc.fileno())
+                method = self._copy_data(fsrc.fileno(), fdst.fileno(), src_st.st_size)
+            try:
+                os.chown(tmp, src_st.st_uid, src_st.st_gid)
+            except PermissionError:
+                pass
+            shutil.copystat(src, tmp)
+            os.replace(tmp, dst)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        self.logger.debug(f"Copied {src} -> {dst} via {method}")
+        return self._count(method)
+    
+    def _copy_data(self, src_fd: int, dst_fd: int, size: int) -> str:
+        try:
+            fcntl.ioctl(dst_fd, self.FICLONE, src_fd)
+            return 'reflink'
+        except OSError as e:
+            if e.errno not in self.FALLBACK_ERRNOS:
+                raise
+        
+        offset = 0
+        if hasattr(os, 'copy_file_range'):
+            try:
+                while offset < size:
+                    copied = os.copy_file_range(src_fd, dst_fd, min(self.chunk_bytes, size - offset))
+                    if not copied:
+                        break
+                    offset += copied
+                if offset >= size:
+                    return 'copy_file_range'
+            except OSError as e:
+                if e.errno not in self.FALLBACK_ERRNOS:
+                    raise
+        
+        try:
+            while offset < size:
+                sent = os.sendfile(dst_fd, src_fd, offset, min(self.chunk_bytes, size - offset))
+                if not sent:
+                    break
+                offset += sent
+            if offset >= size:
+                return 'sendfile'
+        except OSError as e:
+            if e.errno not in self.FALLBACK_ERRNOS:
+                raise
+        
+        os.lseek(src_fd, offset, os.SEEK_SET)
+        os.lseek(dst_fd, offset, os.SEEK_SET)
+        buf = bytearray(self.chunk_bytes)
+        view = memoryview(buf)
+        while True:
+            n = os.readv(src_fd, [buf])
+            if not n:
+                break
+            written = 0
+            while written < n:
+                written += os.write(dst_fd, view[written:n])
+        return 'buffered'
+
+# ============================================================================
+# OPERATION JOURNAL
+# ============================================================================
+
+class OperationJournal:
+    """
+    Append-only JSON-lines journal of deletions and moves.
+    
+    Records are buffered and written with one fsync per group (every
+    group_size records or group_interval seconds, whichever comes first),
+    so journaling costs far less than a sync per operation. Each run of an
+    operation on a target opens with a 'begin' record and closes with an
+    'end' record. begin() on a run that never reached 'end' resumes it, as
+    long as it was started with the same parameters, and exposes what it
+    had already committed.
+    
+    Open runs are tracked in a small side index (journal_path + '.runs')
+    holding each run's start offset, so begin() only reads the records of
+    the run being resumed instead of the whole journal. The journal is an
+    audit trail of every delete and move; once it grows past rotate_mb and
+    no run is open it is rotated to journal_path.1 .. .keep_rotated.
+    """
+    
+    def __init__(self, journal_path: str, logger: logging.Logger, group_size: int = 256,
+                 group_interval: float = 1.0, rotate_mb: int = 256, keep_rotated: int = 4):
+        self.journal_path = journal_path
+        self.runs_path = journal_path + '.runs'
+        self.logger = logger
+        self.group_size = group_size
+        self.group_interval = group_interval
+        self.rotate_bytes = rotate_mb * 1024 * 1024
+        self.keep_rotated = keep_rotated
+        self.run_id: Optional[str] = None
+        self.resumed = False
+        self.completed_dirs: set = set()
+        self.pending_moves: Dict[str, str] = {}
+        self._run_key: Optional[str] = None
+        self._buffer: List[str] = []
+        self._last_commit = time.monotonic()
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._fd = os.open(journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o640)
+        self._open_runs = self._load_runs()
+    
+    def entries(self, run_id: Optional[str] = None) -> Iterator[Dict]:
+        """Yield committed records of the active journal file, optionally for a single run"""
+        for _, record in self._records_from(0):
+            if run_id is None or record.get('run') == run_id:
+                yield record
+    
+    def _records_from(self, offset: int) -> Iterator[Tuple[int, Dict]]:
+        """Yield (offset, record) from offset onwards; torn tail lines are skipped"""
+        try:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    start, offset = offset, offset + len(line)
+                    try:
+                        yield start, json.loads(line)
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            return
+    
+    def _load_runs(self) -> Dict[str, Dict]:
+        """Read the open-run index, rebuilding it with one journal scan if it is missing or corrupt"""
+        try:
+            with open(self.runs_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            pass
+        except ValueError:
+            self.logger.warning(f"Run index {self.runs_path} is corrupt, rebuilding it from the journal")
+        runs: Dict[str, Dict] = {}
+        for offset, record in self._records_from(0):
+            if record.get('op') == 'begin':
+                runs[record['key']] = {'run': record['run'], 'params': record.get('params', {}), 'offset': offset}
+            elif record.get('op') == 'end':
+                for key, run in list(runs.items()):
+                    if run['run'] == record.get('run'):
+                        del runs[key]
+        return runs
+    
+    def _save_runs(self) -> None:
+        tmp_path = self.runs_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self._open_runs, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.runs_path)
+    
+    def _rotate_if_due(self) -> None:
+        """Rotate the journal file once it is past rotate_bytes, but only while no run is open"""
+        if self._open_runs or not self.rotate_bytes or os.fstat(self._fd).st_size < self.rotate_bytes:
+            return
+        os.close(self._fd)
+        if self.keep_rotated > 0:
+            for generation in range(self.keep_rotated - 1, 0, -1):
+                older = f"{self.journal_path}.{generation}"
+                if os.path.exists(older):
+                    os.replace(older, f"{self.journal_path}.{generation + 1}")
+            os.replace(self.journal_path, f"{self.journal_path}.1")
+        else:
+            os.unlink(self.journal_path)
+        self._fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o640)
+        self.logger.info(f"Rotated operation journal {self.journal_path}")
+    
+    def begin(self, operation: str, target: str, params: Optional[Dict] = None) -> str:
+        """Start a run, resuming the last one for the same operation, target and params if it was interrupted"""
+        key = f"{operation}:{os.path.abspath(target)}"
+        params = json.loads(json.dumps(params or {}))
+        self.commit()
+        self.completed_dirs = set()
+        self.pending_moves = {}
+        
+        open_run = self._open_runs.get(key)
+        superseded = None
+        if open_run is not None and open_run['params'] != params:
+            self.logger.warning(f"Not resuming run {open_run['run']} of {key}: parameters changed from "
+                                f"{open_run['params']} to {params}")
+            superseded, open_run = open_run['run'], None
+        if open_run is not None:
+            last_seq, finished = 0, False
+            for _, record in self._records_from(open_run['offset']):
+                if record.get('run') != open_run['run']:
+                    continue
+                last_seq = max(last_seq, record.get('seq', 0))
+                op = record.get('op')
+                if op == 'end':
+                    finished = True
+                elif op == 'dir_done':
+                    self.completed_dirs.add(record['path'])
+                elif op == 'move_intent':
+                    self.pending_moves[record['path']] = record['dst']
+                elif op == 'move':
+                    self.pending_moves.pop(record['path'], None)
+            if finished:
+                self.completed_dirs, self.pending_moves, open_run = set(), {}, None
+        
+        self._run_key = key
+        if open_run is not None:
+            self.run_id, self.resumed, self._seq = open_run['run'], True, last_seq
+            self.logger.info(f"Resuming interrupted run {self.run_id} of {key}: "
+                             f"{len(self.completed_dirs)} directories already done")
+            self.record('resume')
+        else:
+            self._open_runs.pop(key, None)
+            self._rotate_if_due()
+            self.run_id, self.resumed, self._seq = f"{int(time.time() * 1000)}-{os.getpid()}", False, 0
+            offset = os.fstat(self._fd).st_size
+            if superseded is not None:
+                self.record('begin', key=key, params=params, supersedes=superseded)
+            else:
+                self.record('begin', key=key, params=params)
+            self._open_runs[key] = {'run': self.run_id, 'params': params, 'offset': offset}
+        self.commit()
+        self._save_runs()
+        return self.run_id
+    
+    def record(self, op: str, path: Optional[str] = None, **fields) -> None:
+        """Append a record to the current run, group-committing when due"""
+        with self._lock:
+            self._seq += 1
+            record = {'run': self.run_id, 'seq': self._seq, 'ts': round(time.time(), 3), 'op': op}
+            if path is not None:
+                record['path'] = path
+            record.update(fields)
+            self._buffer.append(json.dumps(record) + '\n')
+            if len(self._buffer) >= self.group_size or time.monotonic() - self._last_commit >= self.group_interval:
+                self._flush()
+    
+    def commit(self) -> None:
+        """Write and fsync everything buffered so far"""
+        with self._lock:
+            self._flush()
+    
+    def end(self, summary: Optional[Dict] = None) -> None:
+        """Close the current run so the next begin() starts fresh"""
+        self.record('end', summary=summary or {})
+        self.commit()
+        run = self._open_runs.get(self._run_key)
+        if run is not None and run['run'] == self.run_id:
+            del self._open_runs[self._run_key]
+            self._save_runs()
+        self.run_id = None
+        self._run_key = None
+    
+    def close(self) -> None:
+        self.commit()
+        os.close(self._fd)
+    
+    def _flush(self) -> None:
+        if self._buffer:
+            data = ''.join(self._buffer).encode()
+            while data:
+                data = data[os.write(self._fd, data):]
+            os.fsync(self._fd)
+            self._buffer = []
+        self._last_commit = time.monotonic()
+
+# ============================================================================
+# I/O THROTTLING
+# ============================================================================
+
+class IOThrottle:
+    """
+    Token-bucket throttle for destructive operations, with idle I/O priority.
+    
+    ops_per_sec and bytes_per_sec are ceilings (0 means unlimited). The
+    effective rate adapts AIMD-style to observed operation latency: each
+    operation slower than latency_target halves it, and each fast one
+    restores a step, so cleanup runs at the ceiling on an idle disk and
+    backs off while other workloads are contending for it. With
+    idle_priority, the first throttled operation on each thread moves that
+    thread to the idle I/O class through the ioprio_set syscall and
+    applies niceness; both are per-thread on Linux, so every worker thread
+    of a parallel operation is demoted, not just the first caller.
+    """
+    
+    IOPRIO_WHO_PROCESS = 1
+    IOPRIO_CLASS_IDLE = 3
+    IOPRIO_CLASS_SHIFT = 13
+    IOPRIO_SET_SYSCALL = {'x86_64': 251, 'i386': 289, 'i686': 289, 'aarch64': 30, 'armv7l': 314,
+                          'ppc64le': 273, 's390x': 282, 'riscv64': 30}
+    MIN_SCALE = 0.05
+    RECOVERY_STEP = 0.05
+    
+    def __init__(self, logger: logging.Logger, ops_per_sec: float = 0, bytes_per_sec: float = 0,
+                 idle_priority: bool = False, niceness: int = 10, latency_target: float = 0.05):
+        self.logger = logger
+        self.ops_per_sec = ops_per_sec
+        self.bytes_per_sec = bytes_per_sec
+        self.idle_priority = idle_priority
+        self.niceness = niceness
+        self.latency_target = latency_target
+        self.scale = 1.0
+        self.waited = 0.0
+        self._ops_tokens = ops_per_sec
+        self._byte_tokens = bytes_per_sec
+        self._last_refill = time.monotonic()
+        self._thread_state = threading.local()
+        self.threads_demoted = 0
+        self._lock = threading.Lock()
+    
+    def apply_priority(self) -> bool:
+        """Put the calling thread in the idle I/O class and lower its CPU priority"""
+        self._thread_state.priority_applied = True
+        with self._lock:
+            self.threads_demoted += 1
+            first = self.threads_demoted == 1
+        applied = True
+        nr = self.IOPRIO_SET_SYSCALL.get(os.uname().machine)
+        try:
+            if nr is None:
+                raise OSError(errno.ENOSYS, "ioprio_set syscall number unknown for this architecture")
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            ioprio = self.IOPRIO_CLASS_IDLE << self.IOPRIO_CLASS_SHIFT
+            if libc.syscall(nr, self.IOPRIO_WHO_PROCESS, 0, ioprio) != 0:
+                err = ctypes.get_errno()
+                raise OSError(err, os.strerror(err))
+            if first:
+                self.logger.info("I/O priority set to idle class")
+            else:
+                self.logger.debug(f"I/O priority set to idle class for {threading.current_thread().name}")
+        except OSError as e:
+            applied = False
+            (self.logger.warning if first else self.logger.debug)(f"Could not set idle I/O priority: {e}")
+        if self.niceness:
+            try:
+                os.nice(self.niceness)
+            except OSError as e:
+                self.logger.warning(f"Could not renice: {e}")
+        return applied
+    
+    def acquire(self, nbytes: int = 0) -> None:
+        """Block until one operation covering nbytes fits within the current rate"""
+        if self.idle_priority and not getattr(self._thread_state, 'priority_applied', False):
+            self.apply_priority()
+        if not self.ops_per_sec and not self.bytes_per_sec:
+            return
+        with self._lock:
+            now = time.monotonic()
+            elapsed, self._last_refill = now - self._last_refill, now
+            delay = 0.0
+            if self.ops_per_sec:
+                rate = self.ops_per_sec * self.scale
+                self._ops_tokens = min(rate, self._ops_tokens + elapsed * rate) - 1
+                if self._ops_tokens < 0:
+                    delay = -self._ops_tokens / rate
+            if self.bytes_per_sec:
+                rate = self.bytes_per_sec * self.scale
+                self._byte_tokens = min(rate, self._byte_tokens + elapsed * rate) - nbytes
+                if self._byte_tokens < 0:
+                    delay = max(delay, -self._byte_tokens / rate)
+            self.waited += delay
+        if delay:
+            time.sleep(delay)
+    
+    def observe(self, latency: float) -> None:
+        """Feed back how long an operation took so the rate can adapt"""
+        with self._lock:
+            if latency > self.latency_target:
+                self.scale = max(self.MIN_SCALE, self.scale / 2)
+            elif self.scale < 1.0:
+                self.scale = min(1.0, self.scale + self.RECOVERY_STEP)
+
+# ============================================================================
+# RETENTION POLICY
+# ============================================================================
+
+class RetentionRule(NamedTuple):
+    name: str
+    action: str
+    path: Optional[str] = None
+    glob: Optional[str] = None
+    older_than: float = 0
+    larger_than: int = 0
+    owner: Optional[int] = None
+    mode: Optional[int] = None
+    archive_dir: Optional[str] = None
+
+
+class RetentionPolicy:
+    """
+    Ordered retention rules compiled into a single-pass matcher.
+    
+    Each rule combines optional predicates - path (directory prefix,
+    relative to the scanned root unless absolute), glob (basename pattern,
+    or a root-relative path pattern if it contains '/'), older_than_days,
+    larger_than_mb and owner - with one action: delete, archive, chmod or
+    report. The first rule whose predicates all hold decides a file.
+    
+    Path prefixes are kept in a trie resolved once per directory, literal
+    names in a dict and wildcard globs in one combined regex, so the cost
+    per file does not grow with the number of rules that cannot apply.
+    """
+    
+    ACTIONS = ('delete', 'archive', 'chmod', 'report')
+    
+    def __init__(self, rules: List[Dict]):
+        self.rules = [self._parse_rule(position, rule) for position, rule in enumerate(rules)]
+        names = [rule.name for rule in self.rules]
+        if len(set(names)) != len(names):
+            raise ValueError("Retention rule names must be unique")
+        self.root: Optional[str] = None
+        self._compile_names()
+    
+    @classmethod
+    def load(cls, policy_path: str) -> 'RetentionPolicy':
+        """Load rules from a JSON file: a list of rules or {"rules": [...]}"""
+        with open(policy_path) as f:
+            data = json.load(f)
+        return cls(data['rules'] if isinstance(data, dict) else data)
+    
+    @classmethod
+    def _parse_rule(cls, position: int, spec: Dict) -> RetentionRule:
+        name = spec.get('name', f"rule-{position}")
+        action = spec.get('action')
+        if action not in cls.ACTIONS:
+            raise ValueError(f"Rule {name}: unknown action {action!r}")
+        mode = spec.get('mode')
+        if isinstance(mode, str):
+            mode = int(mode, 8)
+        if action == 'chmod' and mode is None:
+            raise ValueError(f"Rule {name}: chmod requires a mode")
+        owner = spec.get('owner')
+        if isinstance(owner, str) and not owner.isdigit():
+            try:
+                owner = pwd.getpwnam(owner).pw_uid
+            except KeyError:
+                raise ValueError(f"Rule {name}: unknown owner {owner!r}")
+        elif owner is not None:
+            owner = int(owner)
+        return RetentionRule(
+            name=name,
+            action=action,
+            path=spec.get('path'),
+            glob=spec.get('glob'),
+            older_than=float(spec.get('older_than_days', 0)) * 86400,
+            larger_than=int(float(spec.get('larger_than_mb', 0)) * 1024 * 1024),
+            owner=owner,
+            mode=mode,
+            archive_dir=spec.get('archive_dir')
+        )
+    
+    def _compile_names(self) -> None:
+        """Build the literal-name dict and the combined name/path regexes"""
+        self._any_name = set()
+        self._literal_names: Dict[str, set] = {}
+        name_globs: List[Tuple[int, str]] = []
+        path_globs: List[Tuple[int, str]] = []
+        for index, rule in enumerate(self.rules):
+            if rule.glob is None:
+                self._any_name.add(index)
+            elif '/' in rule.glob:
+                path_globs.append((index, rule.glob.lstrip('/')))
+            elif not any(c in rule.glob for c in '*?['):
+                self._literal_names.setdefault(rule.glob, set()).add(index)
+            else:
+                name_globs.append((index, rule.glob))
+        self._name_regex = self._combine(name_globs)
+        self._path_regex = self._combine(path_globs)
+    
+    @staticmethod
+    def _combine(globs: List[Tuple[int, str]]):
+        """
+        Compile globs into (prefilter, matcher, indexes): the prefilter is a
+        plain alternation rejecting non-matches in one call, the matcher uses
+        one optional lookahead group per glob to report every glob that hits.
+        """
+        if not globs:
+            return None
+        translated = [fnmatch.translate(glob) for _, glob in globs]
+        prefilter = re.compile('|'.join(f"(?:{pattern})" for pattern in translated))
+        matcher = re.compile(''.join(f"(?:(?=(?P<p{i}>{pattern})))?" for i, pattern in enumerate(translated)))
+        return prefilter, matcher, [index for index, _ in globs]
+    
+    @staticmethod
+    def _regex_hits(compiled, text: str) -> set:
+        prefilter, matcher, indexes = compiled
+        if not prefilter.match(text):
+            return set()
+        found = matcher.match(text)
+        return {index for i, index in enumerate(indexes) if found.group(f"p{i}") is not None}
+    
+    def prepare(self, root: str) -> None:
+        """Resolve rule path prefixes against the root about to be scanned"""
+        self.root = os.path.abspath(root)
+        self._trie = _PrefixTrie()
+        for index, rule in enumerate(self.rules):
+            prefix = rule.path or os.sep
+            self._trie.insert(prefix if os.path.isabs(prefix) else os.path.join(self.root, prefix), index)
+        self._dir_cache: Tuple[Optional[str], set] = (None, set())
+    
+    def wants_dir(self, dir_path: str) -> bool:
+        """False if no rule can match anything under dir_path, so it can be pruned"""
+        return self._trie.reaches(dir_path)
+    
+    def match(self, entry: WalkEntry, now: float) -> Optional[RetentionRule]:
+        """Return the first rule matching a file entry, or None"""
+        parent = os.path.dirname(entry.path)
+        if parent != self._dir_cache[0]:
+            self._dir_cache = (parent, set(self._trie.collect(parent)))
+        candidates = self._dir_cache[1]
+        if not candidates:
+            return None
+        hits = self._any_name | self._literal_names.get(entry.name, set())
+        if self._name_regex is not None:
+            hits |= self._regex_hits(self._name_regex, entry.name)
+        if self._path_regex is not None:
+            hits |= self._regex_hits(self._path_regex, os.path.relpath(entry.path, self.root))
+        for index in sorted(hits & candidates):
+            rule = self.rules[index]
+            if rule.older_than and entry.mtime >= now - rule.older_than:
+                continue
+            if rule.larger_than and entry.size <= rule.larger_than:
+                continue
+            if rule.owner is not None and entry.stat.st_uid != rule.owner:
+                continue
+            return rule
+        return None
+
 # ============================================================================
 # FILE MANAGEMENT MODULE
 # ============================================================================
@@ -58,11 +1753,272 @@ print("Logger configured")
 class FileManager:
     """File management and organization automation"""
     
-    def __init__(self, logger: logging.Logger):
+    SHARD_MAX_DEPTH = 3
+    SHARDS_PER_PROCESS = 4
+    PARTIAL_HASH_BYTES = 8 * 1024
+    MOVE_BATCH = 1024
+    REMOVE_OPEN_FLAGS = os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW | getattr(os, 'O_CLOEXEC', 0)
+    REMOVE_HELD_FDS = 256
+    FREE_SPACE_PASSES = 3
+    SNAPSHOT_NAME_PATTERN = (r'(?P<year>\d{4})-?(?P<month>\d{2})-?(?P<day>\d{2})'
+                             r'(?:[T_ -]?(?P<hour>\d{2}):?(?P<minute>\d{2}):?(?P<second>\d{2}))?')
+    HASH_CHUNK_BYTES = 1024 * 1024
+    
+    def __init__(self, logger: logging.Logger, workers: int = 1, processes: int = 0,
+                 index: Optional[MetadataIndex] = None, watcher: Optional[IndexWatcher] = None,
+                 hash_cache: Optional[HashCache] = None, journal: Optional[OperationJournal] = None,
+                 throttle: Optional[IOThrottle] = None, truncate_above_mb: int = 0, truncate_step_mb: int = 1024,
+                 trash: Optional['TrashBin'] = None, path_filter: Optional[PathFilter] = None,
+                 boundary: Optional[FilesystemBoundary] = None):
         self.logger = logger
+        self.path_filter = path_filter
+        self.boundary = boundary
+        self.trash = trash
+        self.throttle = throttle
+        self.truncate_above = truncate_above_mb * 1024 * 1024
+        self.truncate_step = max(1, truncate_step_mb) * 1024 * 1024
+        self.journal = journal
+        self.transfer = FileTransfer(logger)
+        self.hash_cache = hash_cache
+        self.workers = workers
+        self.processes = processes
+        self.watcher = watcher
+        self.index = index if index is not None or watcher is None else watcher.index
+        if watcher is not None and (watcher.path_filter is not path_filter or watcher.boundary is not boundary
+                                    or (trash is not None and trash.trash_dir not in watcher.skip_dirs)):
+            self.logger.warning("IndexWatcher was created without this FileManager's path filter, boundary or "
+                                "trash directory; pass them to IndexWatcher so excluded trees are not indexed")
+    
+    def _new_walker(self, stat_files: bool = True, stat_dirs: bool = False, post_order: bool = False) -> TreeWalker:
+        """Create the tree walker used by scanning operations (parallel when workers > 1)"""
+        skip_dirs = {self.trash.trash_dir} if self.trash is not None else None
+        if self.workers > 1 and not post_order:
+            return ParallelTreeWalker(self.logger, workers=self.workers, stat_files=stat_files, stat_dirs=stat_dirs,
+                                      skip_dirs=skip_dirs, path_filter=self.path_filter, boundary=self.boundary)
+        return TreeWalker(self.logger, stat_files=stat_files, stat_dirs=stat_dirs, skip_dirs=skip_dirs,
+                          path_filter=self.path_filter, boundary=self.boundary)
+    
+    def _journaled_walk(self, walker: TreeWalker, root: str,
+                        on_dir_exit: Optional[Callable[[str, int], bool]] = None) -> Iterator[WalkEntry]:
+        """
+        Walk root, journaling each finished directory. Directories that an
+        interrupted run already finished are skipped when it is resumed.
+        """
+        if self.journal is None:
+            yield from walker.walk(root, on_dir_exit=on_dir_exit)
+            return
+        completed = self.journal.completed_dirs
+        
+        def finish_dir(dir_path: str, remaining: int) -> bool:
+            removed = on_dir_exit(dir_path, remaining) if on_dir_exit is not None else False
+            self.journal.record('dir_done', dir_path)
+            return removed
+        
+        for entry in walker.walk(root, on_dir_exit=finish_dir):
+            if entry.is_dir and entry.path in completed:
+                walker.prune()
+                continue
+            yield entry
+    
+    @staticmethod
+    def _can_unlink(path: str) -> bool:
+        """Best-effort check that unlinking path will succeed, so its data is not destroyed before a failed unlink"""
+        parent = os.path.dirname(os.path.abspath(path))
+        if not os.access(parent, os.W_OK | os.X_OK):
+            return False
+        try:
+            dir_st = os.stat(parent)
+            file_st = os.lstat(path)
+        except OSError:
+            return False
+        euid = os.geteuid()
+        if dir_st.st_mode & stat.S_ISVTX and euid not in (0, dir_st.st_uid, file_st.st_uid):
+            return False
+        return True
+    
+    def _truncate_in_steps(self, path: str) -> bool:
+        """
+        Shrink a huge file truncate_step bytes at a time (paced by the
+        throttle) so the filesystem frees its extents gradually instead of in
+        one long unlink. Files with other hard links are left intact, and
+        files that cannot be opened for writing (read-only, immutable) are
+        left for a plain unlink. Returns True if the file was truncated.
+        """
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_NOFOLLOW)
+        except OSError as e:
+            if e.errno in (errno.EACCES, errno.EPERM, errno.ETXTBSY):
+                return False
+            raise
+        try:
+            st = os.fstat(fd)
+            if not stat.S_ISREG(st.st_mode) or st.st_nlink != 1:
+                return False
+            size = st.st_size
+            while size > 0:
+                size = max(0, size - self.truncate_step)
+                if self.throttle is not None:
+                    self.throttle.acquire(self.truncate_step)
+                    start = time.monotonic()
+                    os.ftruncate(fd, size)
+                    self.throttle.observe(time.monotonic() - start)
+                else:
+                    os.ftruncate(fd, size)
+        finally:
+            os.close(fd)
+        return True
+    
+    def _delete_file(self, path: str, results: Dict, size: int = 0) -> bool:
+        """Delete one expired file (paced by the throttle), recording it in results and the journal"""
+        if self.trash is not None and self.trash.move_in(path):
+            results['deleted'] += 1
+            self.logger.info(f"Moved old file to trash: {path}")
+            results['details'].append(f"Deleted {os.path.basename(path)}")
+            if self.journal is not None:
+                self.journal.record('trash', path)
+            return True
+        try:
+            if self.truncate_above and size > self.truncate_above and self._can_unlink(path):
+                if self._truncate_in_steps(path):
+                    size = 0
+            if self.throttle is not None:
+                self.throttle.acquire(size)
+                start = time.monotonic()
+                os.unlink(path)
+                self.throttle.observe(time.monotonic() - start)
+            else:
+                os.unlink(path)
+        except Exception as e:
+            results['errors'] += 1
+            self.logger.warning(f"Could not delete {path}: {e}")
+            return False
+        results['deleted'] += 1
+        self.logger.info(f"Deleted old file: {path}")
+        results['details'].append(f"Deleted {os.path.basename(path)}")
+        if self.journal is not None:
+            self.journal.record('delete', path)
+        return True
+    
+    def _move_file(self, src: str, dst: str) -> str:
+        """Move one file through the transfer engine, journaling intent and completion"""
+        if self.journal is None:
+            return self.transfer.move_file(src, dst)
+        self.journal.record('move_intent', src, dst=dst)
+        method = self.transfer.move_file(src, dst)
+        self.journal.record('move', src, dst=dst, method=method)
+        return method
+    
+    def _recover_moves(self) -> int:
+        """Finish moves an interrupted run left between copy and source unlink"""
+        recovered = 0
+        for src, dst in self.journal.pending_moves.items():
+            if not os.path.exists(dst):
+                continue
+            try:
+                if os.path.exists(src):
+                    if os.stat(src).st_size != os.stat(dst).st_size:
+                        continue
+                    os.unlink(src)
+                self.journal.record('move', src, dst=dst, method='recovered')
+                recovered += 1
+            except OSError as e:
+                self.logger.warning(f"Could not recover move {src} -> {dst}: {e}")
+        if recovered:
+            self.logger.info(f"Recovered {recovered} interrupted moves from the journal")
+        return recovered
+    
+    def _can_shard(self) -> bool:
+        """
+        Process-pool sharding only applies when no per-operation state (journal,
+        throttle, trash) or staged truncation is in play; scan_shard unlinks
+        directly.
+        """
+        return (self.processes > 1 and self.journal is None and self.throttle is None and self.trash is None
+                and not self.truncate_above)
     
-    def organize_by_extension(self, source_dir: str) -> Dict:
-        """Organize files by extension into subdirectories"""
+    def _plan_shards(self, root: str) -> List[Tuple[str, bool]]:
+        """
+        Split root into (path, recursive) shards for the process pool.
+        
+        Starts from the top-level subdirectories and expands one more level
+        at a time (up to SHARD_MAX_DEPTH) until there are enough shards to
+        keep every process busy. Directories that were expanded become
+        non-recursive shards so their own files are still covered.
+        """
+        walker = self._new_walker(stat_files=False, post_order=True)
+        target = self.processes * self.SHARDS_PER_PROCESS
+        shards = []
+        level = [os.fspath(root)]
+        for _ in range(self.SHARD_MAX_DEPTH):
+            children = []
+            for dir_path in level:
+                children.extend(e.path for e in walker.scan_dir(dir_path) if e.is_dir and not e.is_symlink)
+            shards.extend((dir_path, False) for dir_path in level)
+            level = children
+            if len(level) >= target:
+                break
+        shards.extend((dir_path, True) for dir_path in level)
+        return shards
+    
+    def _sharded_scan(self, target_dir: str, op: str, threshold: float, limit: int = 0) -> Dict:
+        """Run scan_shard over a process pool and merge the worker summaries"""
+        shards = self._plan_shards(target_dir)
+        self.logger.info(f"Scanning {target_dir} as {len(shards)} shards on {self.processes} processes")
+        merged = {'count': 0, 'errors': 0, 'items': []}
+        with ProcessPoolExecutor(max_workers=self.processes) as pool:
+            futures = [pool.submit(scan_shard, path, recursive, op, threshold, self.logger.name, limit,
+                                   self.path_filter, self.boundary)
+                       for path, recursive in shards]
+            for future in as_completed(futures):
+                try:
+                    summary = future.result()
+                except Exception as e:
+                    merged['errors'] += 1
+                    self.logger.error(f"Shard scan failed: {e}")
+                    continue
+                merged['count'] += summary['count']
+                merged['errors'] += summary['errors']
+                merged['items'].extend(summary['items'])
+        return merged
+    
+    def _sync_index(self, target_dir: str) -> None:
+        """Bring the index up to date for target_dir: drain the live watcher or rescan incrementally"""
+        if self.watcher is not None and self.watcher.index is self.index and self.watcher.covers(target_dir):
+            self.watcher.sync()
+        else:
+            walker = self._new_walker(post_order=True)
+            walker.set_root(target_dir)
+            self.index.refresh(target_dir, walker=walker)
+    
+    def _indexed_candidates(self, root: str, rows: Iterator[Tuple[str, int, float]],
+                            predicate: Callable[[os.stat_result], bool]) -> Iterator[Tuple[str, os.stat_result]]:
+        """Re-stat indexed query rows, keeping the index current, and yield those still matching"""
+        for path, _, _ in rows:
+            if self.path_filter is not None and not self.path_filter.allows_path(path, root):
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                self.index.remove_file(path)
+                continue
+            if not stat.S_ISREG(st.st_mode):
+                self.index.remove_file(path)
+                continue
+            self.index.update_file(path, st)
+            if predicate(st):
+                yield path, st
+    
+    def organize_by_extension(self, source_dir: str, planned: bool = False, move_workers: int = 1) -> Dict:
+        """
+        Organize files by extension into subdirectories.
+        
+        With planned=True the moves are collected first, each extension
+        directory is created once, name collisions with files already in an
+        extension directory are reported under 'collisions' and skipped
+        instead of overwritten, and moves use os.rename (optionally spread
+        over move_workers threads). Per-file moves are logged at DEBUG and
+        the FileTransfer methods used are tallied under 'methods'.
+        """
         self.logger.info(f"Starting file organization in {source_dir}")
         source_path = Path(source_dir)
         results = {'organized': 0, 'errors': 0, 'details': []}
@@ -71,30 +2027,138 @@ class FileManager:
             self.logger.error(f"Source directory does not exist: {source_dir}")
             return results
         
+        if self.journal is not None:
+            self.journal.begin('organize_by_extension', source_dir)
+            self._recover_moves()
+        
+        if planned:
+            return self._organize_planned(os.fspath(source_dir), results, move_workers)
+        
         try:
-            for file_path in source_path.glob('*'):
-                if file_path.is_file():
-                    ext = file_path.suffix or 'no_extension'
+            for entry in list(self._new_walker(stat_files=False, post_order=True).scan_dir(os.fspath(source_dir))):
+                if entry.is_file:
+                    ext = self._extension_of(entry.name) or 'no_extension'
                     ext_dir = source_path / ext.lstrip('.')
                     ext_dir.mkdir(exist_ok=True)
                     
                     try:
-                        shutil.move(str(file_path), str(ext_dir / file_path.name))
+                        self._move_file(entry.path, str(ext_dir / entry.name))
                         results['organized'] += 1
-                        self.logger.info(f"Organized: {file_path.name} -> {ext}")
-                        results['details'].append(f"Moved {file_path.name} to {ext}/")
+                        self.logger.info(f"Organized: {entry.name} -> {ext}")
+                        results['details'].append(f"Moved {entry.name} to {ext}/")
                     except Exception as e:
                         results['errors'] += 1
-                        self.logger.error(f"Failed to organize {file_path.name}: {e}")
+                        self.logger.error(f"Failed to organize {entry.name}: {e}")
         except Exception as e:
             self.logger.error(f"File organization failed: {e}")
             results['errors'] += 1
         
+        if self.journal is not None:
+            self.journal.end({'organized': results['organized'], 'errors': results['errors']})
         self.logger.info(f"File organization complete: {results['organized']} organized, {results['errors']} errors")
         return results
     
+    @staticmethod
+    def _extension_of(name: str) -> str:
+        """Same result as Path(name).suffix without building a Path"""
+        i = name.rfind('.')
+        return name[i:] if 0 < i < len(name) - 1 else ''
+    
+    def _plan_organize(self, source_dir: str, results: Dict) -> Dict[str, List[str]]:
+        """Group the files directly in source_dir by target extension directory, dropping collisions"""
+        plan: Dict[str, List[str]] = {}
+        for entry in self._new_walker(stat_files=False, post_order=True).scan_dir(source_dir):
+            if entry.is_file:
+                ext = self._extension_of(entry.name) or 'no_extension'
+                plan.setdefault(ext, []).append(entry.name)
+        
+        for ext in list(plan):
+            ext_dir = os.path.join(source_dir, ext.lstrip('.'))
+            try:
+                os.mkdir(ext_dir)
+                existing = set()
+            except FileExistsError:
+                try:
+                    existing = set(os.listdir(ext_dir))
+                except OSError as e:
+                    results['errors'] += len(plan.pop(ext))
+                    self.logger.error(f"Cannot organize into {ext_dir}: {e}")
+                    continue
+            except OSError as e:
+                results['errors'] += len(plan.pop(ext))
+                self.logger.error(f"Cannot create {ext_dir}: {e}")
+                continue
+            collisions = [name for name in plan[ext] if name in existing]
+            if collisions:
+                results['collisions'].extend(os.path.join(ext.lstrip('.'), name) for name in collisions)
+                plan[ext] = [name for name in plan[ext] if name not in existing]
+        return plan
+    
+    def _execute_moves(self, source_dir: str, ext: str, names: List[str]) -> Tuple[List[str], int]:
+        """Move names from source_dir into its ext directory; returns moved names and error count"""
+        ext_dir = os.path.join(source_dir, ext.lstrip('.'))
+        moved, errors = [], 0
+        for name in names:
+            src, dst = os.path.join(source_dir, name), os.path.join(ext_dir, name)
+            try:
+                method = self._move_file(src, dst)
+                moved.append(name)
+                self.logger.debug(f"Organized: {name} -> {ext} ({method})")
+            except Exception as e:
+                errors += 1
+                self.logger.error(f"Failed to organize {name}: {e}")
+        return moved, errors
+    
+    def _organize_planned(self, source_dir: str, results: Dict, move_workers: int) -> Dict:
+        results['collisions'] = []
+        transfers_before = dict(self.transfer.stats)
+        try:
+            plan = self._plan_organize(source_dir, results)
+            batches = [(ext, names[i:i + self.MOVE_BATCH])
+                       for ext, names in plan.items() for i in range(0, len(names), self.MOVE_BATCH)]
+            self.logger.info(f"Organize plan: {sum(len(n) for n in plan.values())} moves into {len(plan)} "
+                             f"directories, {len(results['collisions'])} collisions skipped")
+            with ThreadPoolExecutor(max_workers=max(1, move_workers), thread_name_prefix='organizer') as pool:
+                futures = [(ext, pool.submit(self._execute_moves, source_dir, ext, names)) for ext, names in batches]
+                for ext, future in futures:
+                    moved, errors = future.result()
+                    results['organized'] += len(moved)
+                    results['errors'] += errors
+                    results['details'].extend(f"Moved {name} to {ext}/" for name in moved)
+        except Exception as e:
+            self.logger.error(f"File organization failed: {e}")
+            results['errors'] += 1
+        
+        results['methods'] = {method: count - transfers_before[method]
+                              for method, count in self.transfer.stats.items() if count > transfers_before[method]}
+        if self.journal is not None:
+            self.journal.end({'organized': results['organized'], 'errors': results['errors']})
+        self.logger.info(f"File organization complete: {results['organized']} organized, {results['errors']} errors")
+        return results
+    
+    def _empty_dir_pruner(self, results: Dict, keep: Optional[str] = None) -> Callable[[str, int], bool]:
+        """
+        Build a TreeWalker on_dir_exit callback that removes directories left
+        with no entries, counting into results['removed'] / results['errors'].
+        Since the walker decrements the parent's remaining count on removal,
+        emptiness cascades upwards without relisting any directory.
+        """
+        def prune(dir_path: str, remaining: int) -> bool:
+            if remaining or dir_path == keep:
+                return False
+            try:
+                os.rmdir(dir_path)
+                results['removed'] += 1
+                self.logger.info(f"Removed empty directory: {dir_path}")
+                return True
+            except Exception as e:
+                results['errors'] += 1
+                self.logger.warning(f"Could not remove {dir_path}: {e}")
+                return False
+        return prune
+    
     def cleanup_empty_dirs(self, target_dir: str, recursive: bool = True) -> Dict:
-        """Remove empty directories"""
+        """Remove empty directories (bottom-up, in one post-order pass)"""
         self.logger.info(f"Cleaning empty directories in {target_dir}")
         target_path = Path(target_dir)
         results = {'removed': 0, 'errors': 0}
@@ -105,15 +2169,9 @@ class FileManager:
         
         try:
             if recursive:
-                for dir_path in sorted(target_path.rglob('.'), reverse=True):
-                    if dir_path.is_dir() and not list(dir_path.iterdir()):
-                        try:
-                            dir_path.rmdir()
-                            results['removed'] += 1
-                            self.logger.info(f"Removed empty directory: {dir_path}")
-                        except Exception as e:
-                            results['errors'] += 1
-                            self.logger.warning(f"Could not remove {dir_path}: {e}")
+                walker = self._new_walker(stat_files=False, post_order=True)
+                for _ in walker.walk(target_dir, on_dir_exit=self._empty_dir_pruner(results)):
+                    pass
         except Exception as e:
             self.logger.error(f"Cleanup failed: {e}")
             results['errors'] += 1
@@ -132,19 +2190,29 @@ class FileManager:
             self.logger.error(f"Target directory does not exist: {target_dir}")
             return results
         
+        if self.journal is not None:
+            self.journal.begin('cleanup_old_files', target_dir, {'days': days})
+        
         try:
-            for file_path in target_path.rglob('*'):
-                if file_path.is_file():
-                    file_time = file_path.stat().st_mtime
-                    if file_time < cutoff_time:
-                        try:
-                            file_path.unlink()
-                            results['deleted'] += 1
-                            self.logger.info(f"Deleted old file: {file_path}")
-                            results['details'].append(f"Deleted {file_path.name}")
-                        except Exception as e:
-                            results['errors'] += 1
-                            self.logger.warning(f"Could not delete {file_path}: {e}")
+            if self.index is not None:
+                self._sync_index(target_dir)
+                rows = self.index.query_old_files(target_dir, cutoff_time)
+                for path, st in self._indexed_candidates(target_dir, rows, lambda st: st.st_mtime < cutoff_time):
+                    if self._delete_file(path, results, st.st_size):
+                        self.index.remove_file(path)
+                self.index.commit()
+            elif self._can_shard():
+                summary = self._sharded_scan(target_dir, 'old', cutoff_time)
+                results['deleted'] += summary['count']
+                results['errors'] += summary['errors']
+                results['details'].extend(f"Deleted {name}" for name in summary['items'])
+            else:
+                walker = self._new_walker(post_order=self.journal is not None)
+                for entry in self._journaled_walk(walker, target_dir):
+                    if entry.is_file and entry.mtime < cutoff_time:
+                        self._delete_file(entry.path, results, entry.size)
+            if self.journal is not None:
+                self.journal.end({'deleted': results['deleted'], 'errors': results['errors']})
         except Exception as e:
             self.logger.error(f"Old file cleanup failed: {e}")
             results['errors'] += 1
@@ -152,6 +2220,287 @@ class FileManager:
         self.logger.info(f"Old file cleanup complete: {results['deleted']} deleted, {results['errors']} errors")
         return results
     
+    def cleanup_by_retention(self, target_dir: str, keep_newest: int = 0, max_total_mb: float = 0,
+                             recursive: bool = True) -> Dict:
+        """
+        Enforce count and size retention in every directory of target_dir.
+        
+        In each directory the newest keep_newest files are kept, and/or the
+        newest files whose combined size stays within max_total_mb; all
+        older files are deleted. Each directory has a min-heap by mtime of
+        the files retained so far: a file pushed out of it is already known
+        to be outside the retained set and is deleted at once, so a single
+        traversal suffices and memory is proportional to what is kept.
+        Once a directory has evicted a file, any later-arriving file older
+        than the newest eviction is deleted too, so the retained set is
+        always a newest-first prefix whatever order readdir returns.
+        """
+        self.logger.info(f"Applying retention (keep_newest={keep_newest}, max_total_mb={max_total_mb}) "
+                         f"in {target_dir}")
+        results = {'deleted': 0, 'kept': 0, 'errors': 0, 'details': []}
+        
+        if not os.path.isdir(target_dir):
+            self.logger.error(f"Target directory does not exist: {target_dir}")
+            return results
+        if keep_newest <= 0 and max_total_mb <= 0:
+            self.logger.error("Retention needs keep_newest or max_total_mb")
+            results['errors'] += 1
+            return results
+        
+        max_total = int(max_total_mb * 1024 * 1024)
+        retained: Dict[str, Tuple[list, List[int]]] = {}
+        evicted: Dict[str, Tuple[float, str]] = {}
+        
+        if self.journal is not None:
+            self.journal.begin('cleanup_by_retention', target_dir,
+                               {'keep_newest': keep_newest, 'max_total_mb': max_total_mb})
+        
+        try:
+            walker = self._new_walker(post_order=self.journal is not None)
+            entries = self._journaled_walk(walker, target_dir) if recursive else walker.scan_dir(target_dir)
+            for entry in entries:
+                if not entry.is_file:
+                    continue
+                dir_path = os.path.dirname(entry.path)
+                heap, total = retained.setdefault(dir_path, ([], [0]))
+                if dir_path in evicted and (entry.mtime, entry.path) < evicted[dir_path]:
+                    self._delete_file(entry.path, results, entry.size)
+                    continue
+                heapq.heappush(heap, (entry.mtime, entry.path, entry.size))
+                total[0] += entry.size
+                while heap and ((keep_newest and len(heap) > keep_newest) or (max_total and total[0] > max_total)):
+                    mtime, path, size = heapq.heappop(heap)
+                    total[0] -= size
+                    evicted[dir_path] = (mtime, path)
+                    self._delete_file(path, results, size)
+            if self.journal is not None:
+                self.journal.end({'deleted': results['deleted'], 'errors': results['errors']})
+        except Exception as e:
+            self.logger.error(f"Retention cleanup failed: {e}")
+            results['errors'] += 1
+        
+        results['kept'] = sum(len(heap) for heap, _ in retained.values())
+        self.logger.info(f"Retention complete: {results['deleted']} deleted, {results['kept']} kept in "
+                         f"{len(retained)} directories, {results['errors']} errors")
+        return results
+    
+    def cleanup_gfs(self, target_dir: str, daily: int = 7, weekly: int = 4, monthly: int = 12,
+                    name_pattern: Optional[str] = None, dry_run: bool = False, workers: int = 8) -> Dict:
+        """
+        Grandfather-father-son retention for the snapshots directly inside target_dir.
+        
+        Each file or directory is one snapshot, timestamped from its name
+        (name_pattern, a regex with year/month/day and optional
+        hour/minute/second groups; defaults to SNAPSHOT_NAME_PATTERN) or
+        else its mtime. One pass over the snapshots sorted newest first
+        keeps the newest snapshot of each of the last `daily` days, `weekly`
+        ISO weeks and `monthly` months that have one; everything else is
+        then deleted, directories through remove_tree on one shared pool of
+        `workers` threads.
+        """
+        self.logger.info(f"Applying GFS retention ({daily} daily, {weekly} weekly, {monthly} monthly) "
+                         f"in {target_dir}")
+        results = {'kept': [], 'deleted': 0, 'errors': 0, 'details': []}
+        
+        if not os.path.isdir(target_dir):
+            self.logger.error(f"Target directory does not exist: {target_dir}")
+            return results
+        if daily <= 0 and weekly <= 0 and monthly <= 0:
+            self.logger.error("GFS retention needs at least one daily, weekly or monthly copy")
+            results['errors'] += 1
+            return results
+        
+        try:
+            pattern = re.compile(name_pattern or self.SNAPSHOT_NAME_PATTERN)
+        except re.error as e:
+            self.logger.error(f"Invalid snapshot name pattern {name_pattern!r}: {e}")
+            results['errors'] += 1
+            return results
+        missing = {'year', 'month', 'day'} - set(pattern.groupindex)
+        if missing:
+            self.logger.error(f"Snapshot name pattern {pattern.pattern!r} lacks the "
+                              f"{', '.join(sorted(missing))} group(s)")
+            results['errors'] += 1
+            return results
+        snapshots = []
+        for entry in self._new_walker(stat_dirs=True, post_order=True).scan_dir(target_dir):
+            if entry.is_symlink or not (entry.is_file or entry.is_dir):
+                continue
+            stamp = None
+            found = pattern.search(entry.name)
+            if found:
+                fields = found.groupdict()
+                try:
+                    stamp = datetime(int(fields['year']), int(fields['month']), int(fields['day']),
+                                     int(fields.get('hour') or 0), int(fields.get('minute') or 0),
+                                     int(fields.get('second') or 0))
+                except ValueError:
+                    stamp = None
+            if stamp is None:
+                stamp = datetime.fromtimestamp(entry.mtime)
+            snapshots.append((stamp, entry))
+        snapshots.sort(key=lambda item: (item[0], item[1].name), reverse=True)
+        
+        periods = (
+            (daily, lambda t: t.date()),
+            (weekly, lambda t: t.isocalendar()[:2]),
+            (monthly, lambda t: (t.year, t.month))
+        )
+        seen = [set() for _ in periods]
+        doomed = []
+        for stamp, entry in snapshots:
+            keep = False
+            for (limit, period_of), kept_periods in zip(periods, seen):
+                period = period_of(stamp)
+                if len(kept_periods) < limit and period not in kept_periods:
+                    kept_periods.add(period)
+                    keep = True
+            if keep:
+                results['kept'].append(entry.name)
+            else:
+                doomed.append(entry)
+        
+        if dry_run:
+            results['details'] = [f"Would delete {entry.name}" for entry in doomed]
+            return results
+        
+        if self.journal is not None:
+            self.journal.begin('cleanup_gfs', target_dir, {'daily': daily, 'weekly': weekly, 'monthly': monthly})
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='remove-tree') as pool:
+            for entry in doomed:
+                if entry.is_dir:
+                    removed = self.remove_tree(entry.path, defer=True, pool=pool)
+                    results['errors'] += removed['errors']
+                    if not removed['errors']:
+                        results['deleted'] += 1
+                        results['details'].append(f"Deleted {entry.name}")
+                else:
+                    self._delete_file(entry.path, results, entry.size)
+        if self.journal is not None:
+            self.journal.end({'deleted': results['deleted'], 'errors': results['errors']})
+        
+        self.logger.info(f"GFS retention complete: {len(results['kept'])} kept, {results['deleted']} deleted, "
+                         f"{results['errors']} errors")
+        return results
+    
+    def cleanup_until_free(self, target_dir: str, free_percent: float, order: str = 'age', min_age_days: float = 1,
+                           sys_ops: Optional['SystemOperations'] = None) -> Dict:
+        """
+        Delete files under target_dir, oldest first (order='age') or largest
+        first (order='size'), until the filesystem has free_percent free.
+        
+        The shortfall comes from SystemOperations.check_disk_usage. A walk
+        keeps only the best candidates whose allocated size covers it in a
+        bounded heap, so memory is proportional to what will be deleted;
+        with a metadata index the candidates are paged from the index in
+        order and no walk is needed. Deletion stops as soon as the target is
+        confirmed. Files newer than min_age_days and files with other hard
+        links are never candidates.
+        """
+        self.logger.info(f"Freeing space in {target_dir} until {free_percent:.1f}% is free ({order} order)")
+        results = {'deleted': 0, 'errors': 0, 'details': [], 'freed_mb': 0.0, 'target_met': False,
+                   'disk_usage': {}}
+        sys_ops = sys_ops if sys_ops is not None else SystemOperations(self.logger)
+        
+        if not os.path.isdir(target_dir):
+            self.logger.error(f"Target directory does not exist: {target_dir}")
+            return results
+        if self.trash is not None:
+            self.logger.error("Free-space cleanup cannot defer deletions to a trash bin")
+            results['errors'] += 1
+            return results
+        if order not in ('age', 'size'):
+            self.logger.error(f"Unsupported order: {order}")
+            results['errors'] += 1
+            return results
+        
+        root = os.path.abspath(target_dir)
+        cutoff_time = time.time() - min_age_days * 86400
+        freed = 0
+        
+        def shortfall() -> int:
+            usage = sys_ops.check_disk_usage(root)
+            results['disk_usage'] = usage
+            if not usage['success']:
+                return 0
+            return int((usage['total'] * free_percent / 100 - usage['free']) * 1024 ** 3)
+        
+        def delete(path: str, st: os.stat_result) -> bool:
+            nonlocal freed
+            if not self._delete_file(path, results, st.st_size):
+                return False
+            freed += st.st_blocks * 512
+            return True
+        
+        if self.journal is not None:
+            self.journal.begin('cleanup_until_free', root, {'free_percent': free_percent, 'order': order})
+        
+        try:
+            deficit = shortfall()
+            if self.index is not None and deficit > 0:
+                self._sync_index(root)
+                goal = freed + deficit
+                rows = self.index.iter_files_ordered(root, cutoff_time, order)
+                candidates = self._indexed_candidates(root, rows, lambda st: st.st_mtime < cutoff_time
+                                                      and st.st_nlink == 1)
+                for path, st in candidates:
+                    if delete(path, st):
+                        self.index.remove_file(path)
+                    if freed >= goal:
+                        deficit = shortfall()
+                        if deficit <= 0:
+                            break
+                        goal = freed + deficit
+                self.index.commit()
+            passes = 0
+            while self.index is None and deficit > 0 and passes < self.FREE_SPACE_PASSES:
+                passes += 1
+                goal = freed + deficit
+                progress = False
+                for path, st in self._free_space_candidates(root, deficit, cutoff_time, order):
+                    progress = delete(path, st) or progress
+                    if freed >= goal:
+                        deficit = shortfall()
+                        if deficit <= 0:
+                            break
+                        goal = freed + deficit
+                if not progress:
+                    break
+                deficit = shortfall()
+            results['target_met'] = deficit <= 0
+            if self.journal is not None:
+                self.journal.end({'deleted': results['deleted'], 'errors': results['errors']})
+        except Exception as e:
+            self.logger.error(f"Free-space cleanup failed: {e}")
+            results['errors'] += 1
+        
+        results['freed_mb'] = round(freed / (1024 * 1024), 2)
+        if results['target_met']:
+            self.logger.info(f"Free-space target met: {results['deleted']} deleted, {results['freed_mb']}MB freed")
+        else:
+            self.logger.warning(f"Free-space target not met: {results['deleted']} deleted, "
+                                f"{results['freed_mb']}MB freed, {results['errors']} errors")
+        return results
+    
+    def _free_space_candidates(self, root: str, deficit: int, cutoff_time: float,
+                               order: str) -> List[Tuple[str, os.stat_result]]:
+        """Walk root once, keeping the fewest best-ranked files whose allocated size covers deficit"""
+        heap = []
+        total = 0
+        for entry in self._new_walker().walk(root):
+            if not entry.is_file or entry.is_symlink or entry.mtime >= cutoff_time or entry.stat.st_nlink != 1:
+                continue
+            allocated = entry.stat.st_blocks * 512
+            if not allocated:
+                continue
+            rank = (-entry.mtime,) if order == 'age' else (entry.size, -entry.mtime)
+            heapq.heappush(heap, (rank, entry.path, allocated, entry.stat))
+            total += allocated
+            while total - heap[0][2] >= deficit:
+                total -= heapq.heappop(heap)[2]
+        heap.sort(reverse=True)
+        return [(path, st) for _, path, _, st in heap]
+    
     def change_permissions(self, target_path: str, mode: int, recursive: bool = False) -> Dict:
         """Change file/directory permissions"""
         self.logger.info(f"Changing permissions for {target_path} to {oct(mode)}")
@@ -164,14 +2513,14 @@ class FileManager:
         
         try:
             if recursive and target.is_dir():
-                for item in target.rglob('*'):
+                for entry in self._new_walker(stat_files=False).walk(target_path):
                     try:
-                        item.chmod(mode)
+                        os.chmod(entry.path, mode)
                         results['changed'] += 1
-                        self.logger.debug(f"Changed permissions: {item}")
+                        self.logger.debug(f"Changed permissions: {entry.path}")
                     except Exception as e:
                         results['errors'] += 1
-                        self.logger.warning(f"Could not change {item}: {e}")
+                        self.logger.warning(f"Could not change {entry.path}: {e}")
             else:
                 target.chmod(mode)
                 results['changed'] += 1
@@ -182,27 +2531,775 @@ class FileManager:
         
         return results
     
-    def find_large_files(self, target_dir: str, size_mb: int = 100) -> List[Dict]:
-        """Find files larger than specified size"""
+    def remove_tree(self, target_dir: str, workers: int = 8, keep_root: bool = False, defer: bool = False,
+                    pool: Optional[ThreadPoolExecutor] = None) -> Dict:
+        """
+        Parallel rm -rf.
+        
+        Each directory is opened once, relative to its parent's fd, and its
+        entries are unlinked relative to its own fd (unlinkat) on a pool of
+        worker threads, with subdirectories handed to other workers as they
+        are found. A directory is rmdir'ed relative to its parent's fd as
+        soon as its own entries and all of its subdirectories are gone, so
+        removal proceeds bottom-up without a second pass and without
+        resolving full paths. Parents keep their fd open only while children
+        are outstanding, up to REMOVE_HELD_FDS at a time; beyond that
+        children fall back to path-based calls. With no filter, boundary or
+        throttle, names are unlinked straight off os.listdir and EISDIR
+        marks the subdirectories, so no per-entry d_type check is needed. Returns counts, elapsed time and throughput. With
+        defer=True and a trash bin configured, the whole tree is renamed into
+        the trash in O(1) and left for the purger. Entries rejected by the
+        path filter or lying across the filesystem boundary are kept (counted
+        under 'kept') along with their parent directories, and a filtered
+        tree is never deferred as a whole. Callers removing many trees can
+        pass a shared pool, which is used instead of workers and left open.
+        """
+        self.logger.info(f"Removing tree {target_dir} " +
+                         (f"with {workers} workers" if pool is None else "on the shared pool"))
+        root = os.path.abspath(target_dir)
+        results = {'files_removed': 0, 'dirs_removed': 0, 'errors': 0, 'kept': 0, 'elapsed': 0.0,
+                   'entries_per_sec': 0.0}
+        path_filter = self.path_filter
+        boundary = self.boundary
+        root_dev = boundary.root_device(root) if boundary is not None else None
+        
+        if root == '/' or not os.path.lexists(root):
+            self.logger.error(f"Refusing to remove {target_dir}")
+            results['errors'] += 1
+            return results
+        if defer and not keep_root and path_filter is None and self.trash is not None and self.trash.move_in(root):
+            results['dirs_removed'] += 1
+            self.logger.info(f"Moved {target_dir} to trash for background purge")
+            if self.journal is not None:
+                self.journal.record('trash', root)
+                self.journal.commit()
+            return results
+        if os.path.islink(root) or not os.path.isdir(root):
+            if not keep_root:
+                try:
+                    os.unlink(root)
+                    results['files_removed'] += 1
+                except OSError as e:
+                    results['errors'] += 1
+                    self.logger.warning(f"Could not remove {root}: {e}")
+            return results
+        
+        lock = threading.Lock()
+        done = threading.Condition(lock)
+        outstanding = [0]
+        start = time.monotonic()
+        own_pool = pool is None
+        if own_pool:
+            pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='remove-tree')
+        
+        class Node:
+            __slots__ = ('path', 'name', 'parent', 'pending', 'failed', 'fd')
+            
+            def __init__(self, path: str, name: str, parent):
+                self.path = path
+                self.name = name
+                self.parent = parent
+                self.pending = 1
+                self.failed = False
+                self.fd = None
+        
+        held_fds = [0]
+        
+        def finish(node: Node) -> None:
+            """Called with lock held once a node has nothing pending: rmdir it and cascade upwards"""
+            while node is not None:
+                node.pending -= 1
+                if node.pending:
+                    return
+                parent = node.parent
+                if node.fd is not None:
+                    os.close(node.fd)
+                    node.fd = None
+                    held_fds[0] -= 1
+                if node.failed or (parent is None and keep_root):
+                    if parent is not None:
+                        parent.failed = True
+                else:
+                    try:
+                        if parent is not None and parent.fd is not None:
+                            os.rmdir(node.name, dir_fd=parent.fd)
+                        else:
+                            os.rmdir(node.path)
+                        results['dirs_removed'] += 1
+                    except OSError as e:
+                        results['errors'] += 1
+                        self.logger.warning(f"Could not remove {node.path}: {e}")
+                        if parent is not None:
+                            parent.failed = True
+                node = parent
+        
+        def clear_dir(node: Node) -> None:
+            files = errors = kept = 0
+            subdirs = []
+            fd = None
+            try:
+                parent = node.parent
+                if parent is not None and parent.fd is not None:
+                    fd = os.open(node.name, self.REMOVE_OPEN_FLAGS, dir_fd=parent.fd)
+                else:
+                    fd = os.open(node.path, self.REMOVE_OPEN_FLAGS)
+                if path_filter is None and boundary is None and self.throttle is None:
+                    # Nothing to check per entry: unlink every name and let EISDIR single out subdirectories
+                    for name in os.listdir(fd):
+                        try:
+                            os.unlink(name, dir_fd=fd)
+                            files += 1
+                        except IsADirectoryError:
+                            subdirs.append(name)
+                        except OSError as e:
+                            errors += 1
+                            self.logger.warning(f"Could not remove {os.path.join(node.path, name)}: {e}")
+                else:
+                    with os.scandir(fd) as it:
+                        for entry in it:
+                            try:
+                                is_dir = entry.is_dir(follow_symlinks=False)
+                                if path_filter is not None and not path_filter.allows(
+                                        os.path.join(node.path, entry.name), entry.name, is_dir):
+                                    kept += 1
+                                    continue
+                                if is_dir:
+                                    if boundary is not None and not boundary.allows_dir(
+                                            os.path.join(node.path, entry.name),
+                                            entry.stat(follow_symlinks=False), root_dev):
+                                        kept += 1
+                                        continue
+                                    subdirs.append(entry.name)
+                                    continue
+                                if self.throttle is not None:
+                                    self.throttle.acquire()
+                                os.unlink(entry.name, dir_fd=fd)
+                                files += 1
+                            except OSError as e:
+                                errors += 1
+                                self.logger.warning(f"Could not remove {os.path.join(node.path, entry.name)}: {e}")
+            except OSError as e:
+                errors += 1
+                self.logger.warning(f"Could not open {node.path}: {e}")
+            with lock:
+                results['files_removed'] += files
+                results['errors'] += errors
+                results['kept'] += kept
+                if errors or kept:
+                    node.failed = True
+                if fd is not None:
+                    if subdirs and held_fds[0] < self.REMOVE_HELD_FDS:
+                        node.fd = fd
+                        held_fds[0] += 1
+                    else:
+                        os.close(fd)
+                for name in subdirs:
+                    child = Node(os.path.join(node.path, name), name, node)
+                    node.pending += 1
+                    outstanding[0] += 1
+                    pool.submit(clear_dir, child)
+                finish(node)
+                outstanding[0] -= 1
+                if not outstanding[0]:
+                    done.notify_all()
+        
+        try:
+            with lock:
+                outstanding[0] = 1
+                pool.submit(clear_dir, Node(root, os.path.basename(root), None))
+                while outstanding[0]:
+                    done.wait()
+        except Exception as e:
+            self.logger.error(f"Tree removal failed: {e}")
+            results['errors'] += 1
+        finally:
+            if own_pool:
+                pool.shutdown(wait=True)
+        
+        results['elapsed'] = round(time.monotonic() - start, 3)
+        removed = results['files_removed'] + results['dirs_removed']
+        results['entries_per_sec'] = round(removed / results['elapsed'], 1) if results['elapsed'] else float(removed)
+        if self.journal is not None:
+            self.journal.record('remove_tree', root, files=results['files_removed'], dirs=results['dirs_removed'])
+            self.journal.commit()
+        self.logger.info(f"Removed {results['files_removed']} files and {results['dirs_removed']} directories "
+                         f"from {target_dir} in {results['elapsed']}s ({results['entries_per_sec']}/s), "
+                         f"{results['errors']} errors")
+        return results
+    
+    def archive_old_files(self, target_dir: str, archive_dir: str, days: int = 30, compression: str = 'gz',
+                          level: int = 6, chunk_mb: int = 4) -> Dict:
+        """
+        Archive files older than specified days instead of just deleting them.
+        
+        Expired files are grouped by modification day into per-day tar
+        archives (archive-YYYYMMDD.tar.gz or .tar.xz) under archive_dir.
+        The tar stream is cut into chunk_mb chunks that are compressed
+        independently on a process pool and written in order as a
+        multi-member gzip / multi-stream xz file, which standard tools read
+        as one archive. Originals are removed only after their day's archive
+        has been written and fsynced.
+        """
+        self.logger.info(f"Archiving files older than {days} days in {target_dir} to {archive_dir}")
+        results = {'archived': 0, 'deleted': 0, 'errors': 0, 'details': [], 'archives': [],
+                   'bytes_in': 0, 'bytes_out': 0}
+        cutoff_time = time.time() - (days * 86400)
+        
+        if compression not in ('gz', 'xz'):
+            self.logger.error(f"Unsupported compression: {compression}")
+            results['errors'] += 1
+            return results
+        if not os.path.isdir(target_dir):
+            self.logger.error(f"Target directory does not exist: {target_dir}")
+            return results
+        
+        root = os.path.abspath(target_dir)
+        archive_root = os.path.abspath(archive_dir)
+        os.makedirs(archive_root, exist_ok=True)
+        
+        groups: Dict[Tuple[str, str], List[str]] = {}
+        walker = self._new_walker()
+        walker.skip_dirs.add(archive_root)
+        try:
+            for entry in walker.walk(root):
+                if entry.is_file and not entry.is_symlink and entry.mtime < cutoff_time:
+                    day = datetime.fromtimestamp(entry.mtime).strftime('%Y%m%d')
+                    groups.setdefault((archive_root, day), []).append(entry.path)
+        except Exception as e:
+            self.logger.error(f"Archive scan failed: {e}")
+            results['errors'] += 1
+            return results
+        
+        self._archive_groups(root, groups, results, compression, level, chunk_mb)
+        self.logger.info(f"Archiving complete: {results['archived']} files in {len(results['archives'])} archives, "
+                         f"{results['bytes_in'] / (1024 * 1024):.2f}MB -> {results['bytes_out'] / (1024 * 1024):.2f}MB")
+        return results
+    
+    def _archive_groups(self, root: str, groups: Dict[Tuple[str, str], List[str]], results: Dict,
+                        compression: str = 'gz', level: int = 6, chunk_mb: int = 4) -> None:
+        """Write one archive per (archive_dir, day) group, then delete the archived originals"""
+        if not groups:
+            return
+        processes = self.processes if self.processes > 1 else (os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            for archive_root, day in sorted(groups):
+                paths = groups[(archive_root, day)]
+                os.makedirs(archive_root, exist_ok=True)
+                archive_path = os.path.join(archive_root, f"archive-{day}.tar.{compression}")
+                if os.path.exists(archive_path):
+                    archive_path = os.path.join(
+                        archive_root, f"archive-{day}-{datetime.now().strftime('%H%M%S')}.tar.{compression}")
+                try:
+                    bytes_in, bytes_out = self._write_archive(archive_path, root, paths, pool, compression,
+                                                              level, chunk_mb * 1024 * 1024, processes)
+                except Exception as e:
+                    results['errors'] += 1
+                    self.logger.error(f"Failed to archive {len(paths)} files for {day}: {e}")
+                    continue
+                results['archives'].append(archive_path)
+                results['archived'] += len(paths)
+                results['bytes_in'] += bytes_in
+                results['bytes_out'] += bytes_out
+                self.logger.info(f"Archived {len(paths)} files for {day} into {archive_path}")
+                if self.journal is not None:
+                    self.journal.record('archive', archive_path, files=len(paths))
+                for path in paths:
+                    self._delete_file(path, results)
+    
+    def _write_archive(self, archive_path: str, root: str, paths: List[str], pool: ProcessPoolExecutor,
+                       compression: str, level: int, chunk_bytes: int, in_flight: int) -> Tuple[int, int]:
+        """
+        Stream paths into a tar archive compressed chunk-by-chunk on pool;
+        returns bytes in and out. archive_path must not exist yet, and a
+        partial archive is removed only if this call created it.
+        """
+        with open(archive_path, 'xb') as out:
+            try:
+                stream = _ChunkCompressor(out, pool, compression, level, chunk_bytes, max(2, in_flight * 2))
+                with tarfile.open(fileobj=stream, mode='w|') as tar:
+                    for path in paths:
+                        tar.add(path, arcname=os.path.relpath(path, root), recursive=False)
+                stream.close()
+                out.flush()
+                os.fsync(out.fileno())
+            except BaseException:
+                out.close()
+                os.unlink(archive_path)
+                raise
+        return stream.bytes_in, stream.bytes_out
+    
+    def apply_policy(self, target_dir: str, policy: RetentionPolicy, archive_dir: Optional[str] = None,
+                     dry_run: bool = False) -> Dict:
+        """
+        Apply a RetentionPolicy to target_dir in a single traversal.
+        
+        Every file is matched once against the compiled policy and
+        directories no rule can reach are pruned. Delete and chmod actions
+        run inline; archive matches are grouped per archive directory and
+        day and archived after the walk (archive_dir is the default for
+        rules that do not name one); report matches are only listed.
+        dry_run lists every match without acting on it.
+        """
+        self.logger.info(f"Applying retention policy ({len(policy.rules)} rules) to {target_dir}")
+        results = {'deleted': 0, 'archived': 0, 'changed': 0, 'errors': 0, 'details': [], 'archives': [],
+                   'bytes_in': 0, 'bytes_out': 0, 'reported': [],
+                   'rules': {rule.name: {'matched': 0, 'size_mb': 0.0} for rule in policy.rules}}
+        
+        if not os.path.isdir(target_dir):
+            self.logger.error(f"Target directory does not exist: {target_dir}")
+            return results
+        if archive_dir is None and any(r.action == 'archive' and not r.archive_dir for r in policy.rules):
+            self.logger.error("Archive rules need an archive_dir")
+            results['errors'] += 1
+            return results
+        
+        root = os.path.abspath(target_dir)
+        policy.prepare(root)
+        archive_roots = {os.path.abspath(rule.archive_dir or archive_dir)
+                         for rule in policy.rules if rule.action == 'archive'}
+        groups: Dict[Tuple[str, str], List[str]] = {}
+        now = time.time()
+        
+        if self.journal is not None and not dry_run:
+            self.journal.begin('apply_policy', root, {'rules': len(policy.rules)})
+        
+        try:
+            walker = self._new_walker(post_order=self.journal is not None and not dry_run)
+            walker.skip_dirs.update(archive_roots)
+            # A dry run neither resumes nor journals, so it always lists the whole tree
+            entries = walker.walk(root) if dry_run else self._journaled_walk(walker, root)
+            for entry in entries:
+                if entry.is_dir:
+                    if not policy.wants_dir(entry.path):
+                        walker.prune()
+                    continue
+                if not entry.is_file:
+                    continue
+                rule = policy.match(entry, now)
+                if rule is None:
+                    continue
+                stats = results['rules'][rule.name]
+                stats['matched'] += 1
+                stats['size_mb'] += entry.size / (1024 * 1024)
+                if dry_run or rule.action == 'report':
+                    results['reported'].append({'path': entry.path, 'rule': rule.name, 'action': rule.action,
+                                                'size_mb': round(entry.size / (1024 * 1024), 2)})
+                elif rule.action == 'delete':
+                    self._delete_file(entry.path, results, entry.size)
+                elif rule.action == 'chmod':
+                    try:
+                        os.chmod(entry.path, rule.mode)
+                        results['changed'] += 1
+                        self.logger.debug(f"Changed permissions: {entry.path}")
+                    except Exception as e:
+                        results['errors'] += 1
+                        self.logger.warning(f"Could not change {entry.path}: {e}")
+                elif not entry.is_symlink:
+                    day = datetime.fromtimestamp(entry.mtime).strftime('%Y%m%d')
+                    target = os.path.abspath(rule.archive_dir or archive_dir)
+                    groups.setdefault((target, day), []).append(entry.path)
+            self._archive_groups(root, groups, results)
+            if self.journal is not None and not dry_run:
+                self.journal.end({'deleted': results['deleted'], 'archived': results['archived'],
+                                  'changed': results['changed'], 'errors': results['errors']})
+        except Exception as e:
+            self.logger.error(f"Retention policy failed: {e}")
+            results['errors'] += 1
+        
+        for stats in results['rules'].values():
+            stats['size_mb'] = round(stats['size_mb'], 2)
+        self.logger.info(f"Retention policy complete: {results['deleted']} deleted, {results['archived']} archived, "
+                         f"{results['changed']} changed, {len(results['reported'])} reported, "
+                         f"{results['errors']} errors")
+        return results
+    
+    def find_large_files(self, target_dir: str, size_mb: int = 100, top_n: Optional[int] = None) -> List[Dict]:
+        """
+        Find files larger than specified size.
+        
+        With top_n, only the top_n largest matches are kept (in a bounded
+        heap) and returned largest first.
+        """
         self.logger.info(f"Searching for files larger than {size_mb}MB in {target_dir}")
-        target_path = Path(target_dir)
+        size_bytes = size_mb * 1024 * 1024
+        matches = self._iter_large_files(target_dir, size_bytes, top_n)
+        if top_n is not None:
+            matches = heapq.nlargest(top_n, matches, key=lambda match: match[1])
+        return [{'path': path, 'size_mb': round(size / (1024 * 1024), 2)} for path, size in matches]
+    
+    def iter_large_files(self, target_dir: str, size_mb: int = 100) -> Iterator[Dict]:
+        """Yield files larger than specified size as they are found"""
+        self.logger.info(f"Streaming files larger than {size_mb}MB in {target_dir}")
+        for path, size in self._iter_large_files(target_dir, size_mb * 1024 * 1024):
+            yield {'path': path, 'size_mb': round(size / (1024 * 1024), 2)}
+    
+    def _iter_large_files(self, target_dir: str, size_bytes: int,
+                          top_n: Optional[int] = None) -> Iterator[Tuple[str, int]]:
+        """Yield (path, size) for files above size_bytes using the configured scan backend"""
+        try:
+            if self.index is not None:
+                self._sync_index(target_dir)
+                rows = self.index.query_large_files(target_dir, size_bytes)
+                for path, st in self._indexed_candidates(target_dir, rows, lambda st: st.st_size > size_bytes):
+                    self.logger.info(f"Found large file: {os.path.basename(path)} ({st.st_size / (1024 * 1024):.2f}MB)")
+                    yield path, st.st_size
+                self.index.commit()
+            elif self._can_shard():
+                summary = self._sharded_scan(target_dir, 'large', size_bytes, limit=top_n or 0)
+                yield from summary['items']
+            else:
+                for entry in self._new_walker().walk(target_dir):
+                    if entry.is_file and entry.size > size_bytes:
+                        self.logger.info(f"Found large file: {entry.name} ({entry.size / (1024 * 1024):.2f}MB)")
+                        yield entry.path, entry.size
+        except Exception as e:
+            self.logger.error(f"Failed to search for large files: {e}")
+    
+    def cleanup_pipeline(self, target_dir: str, days: int = 30, size_mb: int = 100,
+                         prune_empty: bool = True) -> Dict:
+        """
+        Fused single-traversal cleanup.
+        
+        Applies age-based deletion, large-file reporting and bottom-up
+        empty-directory pruning as stages on one walk of target_dir. Returns
+        the results of cleanup_old_files, find_large_files and
+        cleanup_empty_dirs under 'old_file_cleanup', 'large_files' and
+        'empty_dir_cleanup'.
+        """
+        self.logger.info(f"Starting fused cleanup in {target_dir}: age > {days} days, "
+                         f"large > {size_mb}MB, prune empty dirs: {prune_empty}")
+        old_files = {'deleted': 0, 'errors': 0, 'details': []}
+        empty_dirs = {'removed': 0, 'errors': 0}
         large_files = []
+        results = {'old_file_cleanup': old_files, 'large_files': large_files, 'empty_dir_cleanup': empty_dirs}
+        cutoff_time = time.time() - (days * 86400)
         size_bytes = size_mb * 1024 * 1024
+        root = os.fspath(target_dir)
         
+        if not os.path.isdir(root):
+            self.logger.error(f"Target directory does not exist: {target_dir}")
+            return results
+        
+        if self.journal is not None:
+            self.journal.begin('cleanup_pipeline', root, {'days': days, 'size_mb': size_mb})
+        
+        prune_dir = self._empty_dir_pruner(empty_dirs, keep=root) if prune_empty else None
+        walker = self._new_walker(post_order=True)
         try:
-            for file_path in target_path.rglob('*'):
-                if file_path.is_file():
-                    file_size = file_path.stat().st_size
-                    if file_size > size_bytes:
-                        large_files.append({
-                            'path': str(file_path),
-                            'size_mb': round(file_size / (1024 * 1024), 2)
-                        })
-                        self.logger.info(f"Found large file: {file_path.name} ({file_size / (1024 * 1024):.2f}MB)")
+            for entry in self._journaled_walk(walker, root, on_dir_exit=prune_dir):
+                if not entry.is_file:
+                    continue
+                if entry.mtime < cutoff_time and self._delete_file(entry.path, old_files, entry.size):
+                    walker.discard()
+                    continue
+                if entry.size > size_bytes:
+                    large_files.append({
+                        'path': entry.path,
+                        'size_mb': round(entry.size / (1024 * 1024), 2)
+                    })
+                    self.logger.info(f"Found large file: {entry.name} ({entry.size / (1024 * 1024):.2f}MB)")
+            if self.journal is not None:
+                self.journal.end({'deleted': old_files['deleted'], 'removed': empty_dirs['removed']})
         except Exception as e:
-            self.logger.error(f"Failed to search for large files: {e}")
+            self.logger.error(f"Fused cleanup failed: {e}")
+            old_files['errors'] += 1
+        
+        self.logger.info(f"Fused cleanup complete: {old_files['deleted']} deleted, "
+                         f"{len(large_files)} large files, {empty_dirs['removed']} directories removed")
+        return results
+    
+    def directory_usage(self, target_dir: str, top_n: int = 20) -> Dict:
+        """
+        du-style per-directory size aggregation in one traversal.
+        
+        Computes apparent size (st_size) and allocated size (st_blocks * 512)
+        for every directory, both for its own files and recursively. Only
+        the directories still open on the walk stack are held in memory,
+        plus a heap of the top_n consumers by allocated size. Hard-linked
+        files are counted once. Returns root totals, the top consumers
+        sorted largest first and the same consumers nested as a tree.
+        """
+        self.logger.info(f"Computing directory usage for {target_dir}")
+        root = os.fspath(target_dir)
+        results = {'path': root, 'apparent_mb': 0.0, 'allocated_mb': 0.0, 'files': 0, 'dirs': 0,
+                   'top': [], 'tree': [], 'errors': 0}
+        
+        if not os.path.isdir(root):
+            self.logger.error(f"Target directory does not exist: {target_dir}")
+            return results
+        
+        # Per open directory: [own apparent, own allocated, total apparent, total allocated, files]
+        open_dirs: Dict[str, List[int]] = {}
+        seen_links = set()
+        top = []
+        
+        def new_dir(dir_path: str, st: Optional[os.stat_result]) -> None:
+            apparent, allocated = (st.st_size, st.st_blocks * 512) if st is not None else (0, 0)
+            open_dirs[dir_path] = [apparent, allocated, apparent, allocated, 0]
+        
+        def close_dir(dir_path: str, remaining: int) -> bool:
+            acc = open_dirs.pop(dir_path)
+            results['dirs'] += 1
+            parent = open_dirs.get(os.path.dirname(dir_path)) if dir_path != root else None
+            if parent is not None:
+                parent[2] += acc[2]
+                parent[3] += acc[3]
+                parent[4] += acc[4]
+            else:
+                results['apparent_mb'] = round(acc[2] / (1024 * 1024), 2)
+                results['allocated_mb'] = round(acc[3] / (1024 * 1024), 2)
+                results['files'] = acc[4]
+            record = (acc[3], dir_path, acc)
+            if len(top) < top_n:
+                heapq.heappush(top, record)
+            elif top_n:
+                heapq.heappushpop(top, record)
+            return False
+        
+        walker = self._new_walker(stat_dirs=True, post_order=True)
+        try:
+            new_dir(root, os.stat(root))
+            for entry in walker.walk(root, on_dir_exit=close_dir):
+                if entry.is_symlink:
+                    continue
+                if entry.is_dir:
+                    new_dir(entry.path, entry.stat)
+                    continue
+                st = entry.stat
+                if st is None:
+                    continue
+                if st.st_nlink > 1:
+                    key = (st.st_dev, st.st_ino)
+                    if key in seen_links:
+                        continue
+                    seen_links.add(key)
+                acc = open_dirs[walker.current_dir]
+                acc[0] += st.st_size
+                acc[1] += st.st_blocks * 512
+                acc[2] += st.st_size
+                acc[3] += st.st_blocks * 512
+                acc[4] += 1
+        except Exception as e:
+            self.logger.error(f"Directory usage scan failed: {e}")
+            results['errors'] += 1
+        results['errors'] += walker.errors
+        
+        nodes = {}
+        for allocated, dir_path, acc in sorted(top, key=lambda record: (-record[0], record[1])):
+            node = {
+                'path': dir_path,
+                'apparent_mb': round(acc[2] / (1024 * 1024), 2),
+                'allocated_mb': round(allocated / (1024 * 1024), 2),
+                'own_apparent_mb': round(acc[0] / (1024 * 1024), 2),
+                'own_allocated_mb': round(acc[1] / (1024 * 1024), 2),
+                'files': acc[4],
+            }
+            results['top'].append(node)
+            nodes[dir_path] = dict(node, children=[])
+        for dir_path in sorted(nodes, key=lambda path: (-nodes[path]['allocated_mb'], path)):
+            ancestor = os.path.dirname(dir_path)
+            while ancestor not in nodes and ancestor != os.path.dirname(ancestor):
+                ancestor = os.path.dirname(ancestor)
+            if ancestor in nodes and ancestor != dir_path:
+                nodes[ancestor]['children'].append(nodes[dir_path])
+            else:
+                results['tree'].append(nodes[dir_path])
+        
+        self.logger.info(f"Directory usage complete: {results['allocated_mb']}MB allocated, "
+                         f"{results['apparent_mb']}MB apparent in {results['files']} files")
+        return results
+    
+    def _partial_hash(self, path: str, st: os.stat_result) -> str:
+        """Hash of the first and last PARTIAL_HASH_BYTES of a file (the whole file if it is small)"""
+        digest = hashlib.blake2b()
+        with open(path, 'rb') as f:
+            if st.st_size <= 2 * self.PARTIAL_HASH_BYTES:
+                digest.update(f.read())
+            else:
+                digest.update(f.read(self.PARTIAL_HASH_BYTES))
+                f.seek(-self.PARTIAL_HASH_BYTES, os.SEEK_END)
+                digest.update(f.read(self.PARTIAL_HASH_BYTES))
+        return digest.hexdigest()
+    
+    def _full_hash(self, path: str, st: os.stat_result) -> str:
+        """Hash of the whole file using large unbuffered reads into a reused buffer"""
+        digest = hashlib.blake2b()
+        buf = bytearray(self.HASH_CHUNK_BYTES)
+        view = memoryview(buf)
+        with open(path, 'rb', buffering=0) as f:
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                digest.update(view[:n])
+        return digest.hexdigest()
+    
+    def _hash_file(self, kind: str, path: str, st: os.stat_result) -> str:
+        """Partial or full content hash of a file, served from the hash cache when it is unchanged"""
+        if self.hash_cache is not None:
+            digest = self.hash_cache.get(st, kind)
+            if digest is not None:
+                return digest
+        digest = self._partial_hash(path, st) if kind == 'partial' else self._full_hash(path, st)
+        if self.hash_cache is not None:
+            self.hash_cache.put(st, kind, digest)
+        return digest
+    
+    def _hash_groups(self, groups: List[List[Tuple[str, os.stat_result]]], kind: str,
+                     pool: ThreadPoolExecutor, errors: List[int]) -> List[List[Tuple[str, os.stat_result]]]:
+        """Split each same-size group by content hash on the pool, keeping only sub-groups of two or more"""
+        futures = {}
+        for group in groups:
+            for path, st in group:
+                futures[pool.submit(self._hash_file, kind, path, st)] = (path, st)
+        by_hash: Dict[Tuple[int, str], List[Tuple[str, os.stat_result]]] = {}
+        for future in as_completed(futures):
+            path, st = futures[future]
+            try:
+                by_hash.setdefault((st.st_size, future.result()), []).append((path, st))
+            except Exception as e:
+                errors[0] += 1
+                self.logger.warning(f"Could not hash {path}: {e}")
+        if self.hash_cache is not None:
+            self.hash_cache.commit()
+        return [sorted(group, key=lambda item: item[0]) for group in by_hash.values() if len(group) > 1]
+    
+    def find_duplicates(self, target_dir: str, min_size_mb: float = 0, hash_workers: int = 4) -> Dict:
+        """
+        Find duplicate files in stages.
+        
+        Files are grouped by size first (hard links to one inode count
+        once), then only same-size candidates get a partial hash of their
+        first and last PARTIAL_HASH_BYTES, and only partial-hash matches are
+        fully hashed. Hashing runs on a pool of hash_workers threads, and
+        digests of unchanged files come from the hash cache when one is set.
+        """
+        self.logger.info(f"Searching for duplicate files in {target_dir}")
+        results = {'groups': [], 'duplicate_files': 0, 'wasted_mb': 0.0, 'errors': 0,
+                   'stages': {'scanned': 0, 'size_candidates': 0, 'partial_candidates': 0, 'full_hashed': 0}}
+        min_bytes = max(1, int(min_size_mb * 1024 * 1024))
+        errors = [0]
+        
+        if not os.path.isdir(target_dir):
+            self.logger.error(f"Target directory does not exist: {target_dir}")
+            return results
         
-        return large_files
+        by_size: Dict[int, List[Tuple[str, os.stat_result]]] = {}
+        groups: List[List[Tuple[str, os.stat_result]]] = []
+        seen_inodes = set()
+        try:
+            walker = self._new_walker()
+            for entry in walker.walk(target_dir):
+                if not entry.is_file or entry.is_symlink or entry.size < min_bytes:
+                    continue
+                results['stages']['scanned'] += 1
+                key = (entry.stat.st_dev, entry.stat.st_ino)
+                if key in seen_inodes:
+                    continue
+                seen_inodes.add(key)
+                by_size.setdefault(entry.size, []).append((entry.path, entry.stat))
+            seen_inodes.clear()
+            
+            groups = [group for group in by_size.values() if len(group) > 1]
+            by_size.clear()
+            results['stages']['size_candidates'] = sum(len(group) for group in groups)
+            
+            with ThreadPoolExecutor(max_workers=max(1, hash_workers), thread_name_prefix='hasher') as pool:
+                groups = self._hash_groups(groups, 'partial', pool, errors)
+                results['stages']['partial_candidates'] = sum(len(group) for group in groups)
+                small = [group for group in groups if group[0][1].st_size <= 2 * self.PARTIAL_HASH_BYTES]
+                large = [group for group in groups if group[0][1].st_size > 2 * self.PARTIAL_HASH_BYTES]
+                results['stages']['full_hashed'] = sum(len(group) for group in large)
+                groups = small + self._hash_groups(large, 'full', pool, errors)
+        except Exception as e:
+            self.logger.error(f"Duplicate search failed: {e}")
+            errors[0] += 1
+        
+        wasted = 0
+        for group in sorted(groups, key=lambda g: -g[0][1].st_size * (len(g) - 1)):
+            size = group[0][1].st_size
+            wasted += size * (len(group) - 1)
+            results['duplicate_files'] += len(group) - 1
+            results['groups'].append({'size_mb': round(size / (1024 * 1024), 2), 'paths': [path for path, _ in group]})
+        results['wasted_mb'] = round(wasted / (1024 * 1024), 2)
+        results['errors'] = errors[0]
+        
+        self.logger.info(f"Duplicate search complete: {len(results['groups'])} groups, "
+                         f"{results['duplicate_files']} duplicates, {results['wasted_mb']}MB reclaimable")
+        return results
+
+# ============================================================================
+# DEFERRED DELETION
+# ============================================================================
+
+class TrashBin:
+    """
+    Same-filesystem trash area for deferred deletion.
+    
+    move_in() renames a file or a whole directory into the current batch
+    directory, which is O(1) regardless of size, so callers can finish
+    quickly. purge() later removes trashed batches with FileManager.remove_tree
+    at idle I/O priority, either on a background thread (start_purger) or in
+    a detached process that outlives the caller (spawn_purger). Paths on a
+    different filesystem cannot be renamed in and are reported back as not
+    trashed so the caller can delete them directly.
+    """
+    
+    def __init__(self, trash_dir: str, logger: logging.Logger, purge_workers: int = 2):
+        self.trash_dir = os.path.abspath(trash_dir)
+        self.logger = logger
+        self.purge_workers = purge_workers
+        os.makedirs(self.trash_dir, mode=0o700, exist_ok=True)
+        self.dev = os.stat(self.trash_dir).st_dev
+        self.batch_dir = os.path.join(self.trash_dir, f"batch-{datetime.now().strftime('%Y%m%d%H%M%S')}-{os.getpid()}")
+        self._batch_created = False
+        self._counter = 0
+        self._lock = threading.Lock()
+    
+    def move_in(self, path: str) -> bool:
+        """Rename path into the trash; returns False if it is on another filesystem or the rename fails"""
+        with self._lock:
+            if not self._batch_created:
+                os.makedirs(self.batch_dir, mode=0o700, exist_ok=True)
+                self._batch_created = True
+            self._counter += 1
+            dst = os.path.join(self.batch_dir, f"{self._counter}-{os.path.basename(path)}")
+        try:
+            os.rename(path, dst)
+            return True
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                self.logger.warning(f"Could not move {path} to trash: {e}")
+            return False
+    
+    def purge(self, include_current: bool = True) -> Dict:
+        """Remove trashed batches at idle I/O priority"""
+        throttle = IOThrottle(self.logger, idle_priority=True)
+        file_mgr = FileManager(self.logger, throttle=throttle)
+        results = {'batches': 0, 'files_removed': 0, 'dirs_removed': 0, 'errors': 0}
+        for entry in TreeWalker(self.logger, stat_files=False).scan_dir(self.trash_dir):
+            if entry.path == self.batch_dir and not include_current:
+                continue
+            removed = file_mgr.remove_tree(entry.path, workers=self.purge_workers)
+            results['batches'] += 1
+            for key in ('files_removed', 'dirs_removed', 'errors'):
+                results[key] += removed[key]
+        if include_current:
+            self._batch_created = False
+        self.logger.info(f"Trash purge complete: {results['batches']} batches, {results['files_removed']} files removed")
+        return results
+    
+    def start_purger(self) -> threading.Thread:
+        """Purge on a daemon thread (for long-running callers)"""
+        thread = threading.Thread(target=self.purge, name='trash-purger', daemon=True)
+        thread.start()
+        return thread
+    
+    def spawn_purger(self) -> subprocess.Popen:
+        """Purge in a detached process so short-lived jobs can exit immediately"""
+        return subprocess.Popen([sys.executable, os.path.abspath(__file__), '--purge-trash', self.trash_dir],
+                                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                start_new_session=True)
 
 # ============================================================================
 # SYSTEM OPERATIONS MODULE
@@ -298,10 +3395,19 @@ print("System operations module loaded")
 # ============================================================================
 
 if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Linux Automation Toolkit')
+    parser.add_argument('--purge-trash', type=str, default=None, help='Purge a TrashBin directory and exit')
+    args = parser.parse_args()
+    
     # Initialize logger
     logger_instance = AutomationLogger()
     logger = logger_instance.get_logger()
     
+    if args.purge_trash:
+        TrashBin(args.purge_trash, logger).purge()
+        sys.exit(0)
+    
     logger.info("="*80)
     logger.info("Linux Automation Toolkit Started")
     logger.info("="*80)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Tree Removal Benchmark
+Compares rm -rf against FileManager.remove_tree on a tree of small files
+"""
+
+import os
+import time
+import logging
+import tempfile
+import argparse
+import statistics
+import subprocess
+from automation_toolkit import FileManager
+
+def build_tree(root: str, dirs: int, files_per_dir: int) -> int:
+    """Create dirs leaf directories of empty files and return the entry count"""
+    count = 0
+    for d in range(dirs):
+        sub = os.path.join(root, f"dir_{d // 100}", f"sub_{d}")
+        os.makedirs(sub)
+        count += 1
+        for f in range(files_per_dir):
+            open(os.path.join(sub, f"file_{f}"), 'w').close()
+            count += 1
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark parallel tree removal against rm -rf')
+    parser.add_argument('--dirs', type=int, default=1000, help='Number of leaf directories')
+    parser.add_argument('--files', type=int, default=200, help='Files per leaf directory')
+    parser.add_argument('--workers', type=int, default=8, help='remove_tree worker threads')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs of each, alternating which goes first')
+    args = parser.parse_args()
+
+    file_mgr = FileManager(logging.getLogger('remove_tree_benchmark'))
+    base = tempfile.mkdtemp()
+    rm_times, tree_times, errors = [], [], 0
+    try:
+        target = os.path.join(base, 'tree')
+
+        def run_rm():
+            start = time.perf_counter()
+            subprocess.run(['rm', '-rf', target], check=True)
+            rm_times.append(time.perf_counter() - start)
+
+        def run_remove_tree():
+            nonlocal errors
+            start = time.perf_counter()
+            errors += file_mgr.remove_tree(target, workers=args.workers)['errors']
+            tree_times.append(time.perf_counter() - start)
+
+        for i in range(args.repeat):
+            for run in ((run_rm, run_remove_tree) if i % 2 else (run_remove_tree, run_rm)):
+                entries = build_tree(target, args.dirs, args.files)
+                os.sync()
+                run()
+
+        rm_time, tree_time = statistics.median(rm_times), statistics.median(tree_times)
+        print(f"Tree: {entries} entries, median of {args.repeat} runs each")
+        print(f"rm -rf:      {rm_time:.3f}s ({entries / rm_time:.0f} entries/s)")
+        print(f"remove_tree: {tree_time:.3f}s ({entries / tree_time:.0f} entries/s, "
+              f"{args.workers} workers, {errors} errors)")
+    finally:
+        subprocess.run(['rm', '-rf', base])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Tree Walker Benchmark
+Compares the legacy Path.rglob scan against the shared scandir TreeWalker
+"""
+
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+import argparse
+import subprocess
+from pathlib import Path
+from typing import Optional
+from automation_toolkit import TreeWalker
+
+def build_tree(root: Path, dirs: int, files_per_dir: int) -> int:
+    """Create a synthetic tree and return the number of entries created"""
+    count = 0
+    for d in range(dirs):
+        sub = root / f"dir_{d // 10}" / f"sub_{d}"
+        sub.mkdir(parents=True, exist_ok=True)
+        count += 1
+        for f in range(files_per_dir):
+            (sub / f"file_{f}.log").write_bytes(b'x' * (f % 7))
+            count += 1
+    return count
+
+class SyscallCounter:
+    """Count os-level stat/scandir calls issued from Python code"""
+
+    def __init__(self):
+        self.counts = {'stat': 0, 'lstat': 0, 'scandir': 0}
+        self._originals = {}
+
+    def __enter__(self):
+        for name in self.counts:
+            original = getattr(os, name)
+            self._originals[name] = original
+
+            def wrapper(*args, _name=name, _original=original, **kwargs):
+                self.counts[_name] += 1
+                return _original(*args, **kwargs)
+            setattr(os, name, wrapper)
+        return self
+
+    def __exit__(self, *exc):
+        for name, original in self._originals.items():
+            setattr(os, name, original)
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+def scan_rglob(root: str) -> int:
+    """Legacy scan: rglob + is_file + stat, as FileManager used to do"""
+    total = 0
+    for file_path in Path(root).rglob('*'):
+        if file_path.is_file():
+            total += file_path.stat().st_size
+    return total
+
+def scan_walker(root: str, walker: TreeWalker) -> int:
+    """New scan: one TreeWalker pass using DirEntry d_type and cached stat"""
+    total = 0
+    for entry in walker.walk(root):
+        if entry.is_file:
+            total += entry.size
+    return total
+
+def strace_counts(root: str, mode: str) -> Optional[str]:
+    """Return strace -c summary for one scan mode, or None without strace"""
+    if not shutil.which('strace'):
+        return None
+    cmd = ['strace', '-f', '-c', '-e', 'trace=%stat,getdents64,openat,close',
+           sys.executable, __file__, '--child', mode, root]
+    process = subprocess.run(cmd, capture_output=True, text=True)
+    return process.stderr
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark FileManager tree scanning')
+    parser.add_argument('--dirs', type=int, default=200, help='Number of leaf directories')
+    parser.add_argument('--files', type=int, default=100, help='Files per leaf directory')
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'ROOT'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    logger = logging.getLogger('walker_benchmark')
+
+    if args.child:
+        mode, root = args.child
+        if mode == 'rglob':
+            scan_rglob(root)
+        else:
+            scan_walker(root, TreeWalker(logger))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        entries = build_tree(Path(tmp), args.dirs, args.files)
+        print(f"Tree: {entries} entries under {tmp}")
+
+        with SyscallCounter() as counter:
+            start = time.perf_counter()
+            scan_rglob(tmp)
+            rglob_time = time.perf_counter() - start
+        rglob_calls = counter.total
+
+        walker = TreeWalker(logger)
+        start = time.perf_counter()
+        scan_walker(tmp, walker)
+        walker_time = time.perf_counter() - start
+        walker_calls = walker.dirs_scanned + walker.stat_calls
+
+        print(f"rglob:  {rglob_time:.3f}s, {rglob_calls} stat/scandir calls "
+              f"({rglob_calls / entries:.2f} per entry) {counter.counts}")
+        print(f"walker: {walker_time:.3f}s, {walker_calls} stat/scandir calls "
+              f"({walker_calls / entries:.2f} per entry) "
+              f"{{'stat': {walker.stat_calls}, 'scandir': {walker.dirs_scanned}}}")
+
+        for mode in ('rglob', 'walker'):
+            summary = strace_counts(tmp, mode)
+            if summary:
+                print(f"\nstrace summary ({mode}):\n{summary}")
+
+if __name__ == '__main__':
+    main()
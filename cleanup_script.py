@@ -6,11 +6,19 @@ Demonstrates automated cleanup operations using the automation toolkit
 
 import sys
 from pathlib import Path
-from automation_toolkit import AutomationLogger, FileManager, SystemOperations
+from automation_toolkit import AutomationLogger, FileManager, SystemOperations, MetadataIndex, OperationJournal, IOThrottle, TrashBin, RetentionPolicy, PathFilter, FilesystemBoundary
 import json
 import argparse
 
-def run_daily_cleanup(target_dir: str, log_output: bool = True) -> dict:
+def run_daily_cleanup(target_dir: str, log_output: bool = True, fused: bool = False, workers: int = 1,
+                      processes: int = 0, index_path: str = None, journal_path: str = None,
+                      max_ops: float = 0, max_mbps: float = 0, idle_io: bool = False,
+                      truncate_above_mb: int = 0, trash_dir: str = None,
+                      archive_dir: str = None, policy_path: str = None, excludes: list = None,
+                      filter_path: str = None, one_filesystem: bool = False,
+                      skip_fstypes: list = None, skip_network_fs: bool = False, free_percent: float = 0,
+                      free_order: str = 'age', keep_newest: int = 0, max_dir_mb: float = 0,
+                      gfs_dir: str = None, gfs_keep: tuple = (7, 4, 12)) -> dict:
     """
     Execute daily cleanup operations on target directory
     
@@ -19,6 +27,35 @@ def run_daily_cleanup(target_dir: str, log_output: bool = True) -> dict:
     2. Clean up empty directories
     3. Organize remaining files by extension
     4. Generate cleanup report
+    
+    With fused=True, steps 1 and 2 plus a large-file report run as stages
+    of a single traversal of the target directory. workers > 1 scans
+    directories on a thread pool (useful on NFS/CephFS mounts);
+    processes > 1 shards the old-file scan across worker processes.
+    index_path keeps a persistent metadata index so only changed
+    directories are re-listed on each run. journal_path records every
+    deletion in an append-only journal and lets an interrupted run resume.
+    max_ops / max_mbps cap the deletion rate and idle_io runs deletions in
+    the idle I/O priority class. Files above truncate_above_mb are shrunk
+    in steps before being unlinked. trash_dir renames expired files into a
+    same-filesystem trash instead and purges it in a detached process.
+    archive_dir compresses expired files into per-day tar archives there
+    before removing them (replaces step 1; fused mode is ignored).
+    policy_path applies a JSON retention policy in place of step 1, with
+    archive_dir as the default destination for its archive rules.
+    excludes (patterns) and filter_path (a pattern file) are compiled into
+    one PathFilter that every scan honours. one_filesystem keeps scans on
+    the target's filesystem (like find -xdev), skip_fstypes names further
+    filesystem types never to enter and skip_network_fs adds NFS, CIFS,
+    Ceph and other network filesystems to them. Any of the three also
+    prunes pseudo filesystems such as /proc and /sys; without them no
+    mount checks are made. free_percent then
+    deletes further files, oldest (or, with free_order='size', largest)
+    first, until the target's filesystem has that much space free.
+    keep_newest / max_dir_mb keep only the newest N files, or the newest
+    files within that many MB, in every directory. gfs_dir applies
+    grandfather-father-son retention (gfs_keep = daily, weekly, monthly
+    copies) to the backup snapshots in that directory.
     """
     
     # Initialize logger
@@ -36,7 +73,27 @@ def run_daily_cleanup(target_dir: str, log_output: bool = True) -> dict:
         return {'success': False, 'error': 'Directory not found'}
     
     # Initialize file manager
-    file_mgr = FileManager(logger)
+    index = MetadataIndex(index_path, logger) if index_path else None
+    journal = OperationJournal(journal_path, logger) if journal_path else None
+    trash = TrashBin(trash_dir, logger) if trash_dir else None
+    path_filter = None
+    if filter_path:
+        path_filter = PathFilter.load(filter_path, excludes=excludes)
+    elif excludes:
+        path_filter = PathFilter(excludes)
+    boundary = None
+    if one_filesystem or skip_fstypes or skip_network_fs:
+        fstypes = FilesystemBoundary.PSEUDO_FSTYPES | set(skip_fstypes or [])
+        if skip_network_fs:
+            fstypes |= FilesystemBoundary.NETWORK_FSTYPES
+        boundary = FilesystemBoundary(one_filesystem=one_filesystem, skip_fstypes=fstypes)
+    throttle = None
+    if max_ops or max_mbps or idle_io:
+        throttle = IOThrottle(logger, ops_per_sec=max_ops, bytes_per_sec=max_mbps * 1024 * 1024,
+                              idle_priority=idle_io)
+    file_mgr = FileManager(logger, workers=workers, processes=processes, index=index, journal=journal,
+                           throttle=throttle, truncate_above_mb=truncate_above_mb,
+                           trash=trash, path_filter=path_filter, boundary=boundary)
     sys_ops = SystemOperations(logger)
     
     results = {
@@ -46,15 +103,65 @@ def run_daily_cleanup(target_dir: str, log_output: bool = True) -> dict:
     }
     
     try:
-        # Operation 1: Cleanup old files (older than 30 days)
-        logger.info("Starting old file cleanup...")
-        cleanup_result = file_mgr.cleanup_old_files(target_dir, days=30)
-        results['operations']['old_file_cleanup'] = cleanup_result
+        large_files = None
+        if policy_path:
+            # Operation 1: Apply the retention policy in a single traversal
+            logger.info("Applying retention policy...")
+            cleanup_result = file_mgr.apply_policy(target_dir, RetentionPolicy.load(policy_path),
+                                                   archive_dir=archive_dir)
+            results['operations']['retention_policy'] = cleanup_result
+            
+            logger.info("Starting empty directory cleanup...")
+            empty_dir_result = file_mgr.cleanup_empty_dirs(target_dir, recursive=True)
+            results['operations']['empty_dir_cleanup'] = empty_dir_result
+        elif archive_dir:
+            # Operation 1: Archive old files instead of deleting them outright
+            logger.info("Starting old file archiving...")
+            cleanup_result = file_mgr.archive_old_files(target_dir, archive_dir, days=30)
+            results['operations']['old_file_archive'] = cleanup_result
+            
+            logger.info("Starting empty directory cleanup...")
+            empty_dir_result = file_mgr.cleanup_empty_dirs(target_dir, recursive=True)
+            results['operations']['empty_dir_cleanup'] = empty_dir_result
+        elif fused:
+            # Operations 1 and 2 in one traversal, with large-file reporting
+            logger.info("Starting fused cleanup pipeline...")
+            pipeline_result = file_mgr.cleanup_pipeline(target_dir, days=30, size_mb=100)
+            cleanup_result = pipeline_result['old_file_cleanup']
+            empty_dir_result = pipeline_result['empty_dir_cleanup']
+            large_files = pipeline_result['large_files']
+            results['operations'].update(pipeline_result)
+        else:
+            # Operation 1: Cleanup old files (older than 30 days)
+            logger.info("Starting old file cleanup...")
+            cleanup_result = file_mgr.cleanup_old_files(target_dir, days=30)
+            results['operations']['old_file_cleanup'] = cleanup_result
+            
+            # Operation 2: Remove empty directories
+            logger.info("Starting empty directory cleanup...")
+            empty_dir_result = file_mgr.cleanup_empty_dirs(target_dir, recursive=True)
+            results['operations']['empty_dir_cleanup'] = empty_dir_result
+        
+        if keep_newest or max_dir_mb:
+            logger.info("Starting per-directory retention...")
+            retention_result = file_mgr.cleanup_by_retention(target_dir, keep_newest=keep_newest,
+                                                             max_total_mb=max_dir_mb)
+            results['operations']['retention_cleanup'] = retention_result
+        
+        if gfs_dir:
+            logger.info("Starting GFS backup retention...")
+            daily, weekly, monthly = gfs_keep
+            gfs_result = file_mgr.cleanup_gfs(gfs_dir, daily=daily, weekly=weekly, monthly=monthly)
+            results['operations']['gfs_retention'] = gfs_result
+        
+        if free_percent:
+            logger.info("Starting free-space cleanup...")
+            free_result = file_mgr.cleanup_until_free(target_dir, free_percent, order=free_order, sys_ops=sys_ops)
+            results['operations']['free_space_cleanup'] = free_result
         
-        # Operation 2: Remove empty directories
-        logger.info("Starting empty directory cleanup...")
-        empty_dir_result = file_mgr.cleanup_empty_dirs(target_dir, recursive=True)
-        results['operations']['empty_dir_cleanup'] = empty_dir_result
+        if trash is not None:
+            logger.info("Starting background trash purge...")
+            trash.spawn_purger()
         
         # Operation 3: Check system health
         logger.info("Checking system health...")
@@ -67,10 +174,26 @@ def run_daily_cleanup(target_dir: str, log_output: bool = True) -> dict:
             print("\n" + "="*80)
             print("CLEANUP REPORT")
             print("="*80)
+            if policy_path:
+                print(f"Files matched by policy: {sum(r['matched'] for r in cleanup_result['rules'].values())}")
+                print(f"Files archived: {cleanup_result['archived']}, permissions changed: "
+                      f"{cleanup_result['changed']}, reported: {len(cleanup_result['reported'])}")
+            elif archive_dir:
+                print(f"Old files archived: {cleanup_result['archived']} "
+                      f"({len(cleanup_result['archives'])} archives)")
             print(f"Old files deleted: {cleanup_result['deleted']}")
             print(f"Errors during deletion: {cleanup_result['errors']}")
             print(f"Empty directories removed: {empty_dir_result['removed']}")
+            if keep_newest or max_dir_mb:
+                print(f"Retention: {retention_result['deleted']} deleted, {retention_result['kept']} kept")
+            if gfs_dir:
+                print(f"GFS retention: {gfs_result['deleted']} snapshots deleted, {len(gfs_result['kept'])} kept")
+            if free_percent:
+                print(f"Free-space cleanup: {free_result['deleted']} deleted, {free_result['freed_mb']}MB freed, "
+                      f"target {'met' if free_result['target_met'] else 'not met'}")
             print(f"Errors during removal: {empty_dir_result['errors']}")
+            if large_files is not None:
+                print(f"Large files (>100MB) remaining: {len(large_files)}")
             if disk_usage['success']:
                 print(f"Disk usage: {disk_usage['percent']:.1f}% ({disk_usage['used']:.1f}GB/{disk_usage['total']:.1f}GB)")
             print("="*80 + "\n")
@@ -88,10 +211,45 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Daily cleanup automation script')
     parser.add_argument('--target', '-t', type=str, default='/tmp', help='Target directory for cleanup')
     parser.add_argument('--quiet', '-q', action='store_true', help='Suppress report output')
+    parser.add_argument('--fused', action='store_true', help='Run cleanup stages in a single traversal')
+    parser.add_argument('--workers', '-w', type=int, default=1, help='Parallel directory scan threads')
+    parser.add_argument('--processes', '-p', type=int, default=0, help='Worker processes for sharded scans')
+    parser.add_argument('--index', type=str, default=None, help='SQLite metadata index for incremental rescans')
+    parser.add_argument('--journal', type=str, default=None, help='Operation journal for audit and resume')
+    parser.add_argument('--max-ops', type=float, default=0, help='Maximum deletions per second (0 = unlimited)')
+    parser.add_argument('--max-mbps', type=float, default=0, help='Maximum MB deleted per second (0 = unlimited)')
+    parser.add_argument('--idle-io', action='store_true', help='Run deletions in the idle I/O priority class')
+    parser.add_argument('--truncate-above-mb', type=int, default=0, help='Shrink files above this size in steps before unlinking')
+    parser.add_argument('--trash', type=str, default=None, help='Same-filesystem trash directory for deferred deletion')
+    parser.add_argument('--archive', type=str, default=None, help='Archive old files into per-day tar.gz files here instead of deleting')
+    parser.add_argument('--exclude', action='append', default=None, help='Path pattern to exclude from every scan (repeatable)')
+    parser.add_argument('--filter', type=str, default=None, help='File of exclude patterns (! prefix marks an include)')
+    parser.add_argument('--one-filesystem', '-x', action='store_true', help='Do not cross filesystem boundaries')
+    parser.add_argument('--skip-fstype', action='append', default=None, help='Filesystem type never to enter (repeatable)')
+    parser.add_argument('--skip-network-fs', action='store_true', help='Never enter NFS, CIFS, Ceph and other network filesystems')
+    parser.add_argument('--free-percent', type=float, default=0, help='Keep deleting until this much of the filesystem is free')
+    parser.add_argument('--free-order', choices=['age', 'size'], default='age', help='Free-space deletion order: oldest or largest first')
+    parser.add_argument('--keep-newest', type=int, default=0, help='Keep only the newest N files in each directory')
+    parser.add_argument('--max-dir-mb', type=float, default=0, help='Keep only the newest files within this many MB per directory')
+    parser.add_argument('--gfs-dir', type=str, default=None, help='Backup directory for grandfather-father-son retention')
+    parser.add_argument('--gfs-keep', type=int, nargs=3, default=[7, 4, 12], metavar=('DAILY', 'WEEKLY', 'MONTHLY'),
+                        help='Daily, weekly and monthly copies kept by --gfs-dir')
+    parser.add_argument('--policy', type=str, default=None, help='JSON retention policy applied instead of the 30-day cleanup')
     
     args = parser.parse_args()
     
-    result = run_daily_cleanup(args.target, log_output=not args.quiet)
+    result = run_daily_cleanup(args.target, log_output=not args.quiet, fused=args.fused, workers=args.workers,
+                               processes=args.processes, index_path=args.index,
+                               journal_path=args.journal, max_ops=args.max_ops,
+                               max_mbps=args.max_mbps, idle_io=args.idle_io,
+                               truncate_above_mb=args.truncate_above_mb, trash_dir=args.trash,
+                               archive_dir=args.archive, policy_path=args.policy,
+                               excludes=args.exclude, filter_path=args.filter,
+                               one_filesystem=args.one_filesystem, skip_fstypes=args.skip_fstype,
+                               skip_network_fs=args.skip_network_fs,
+                               free_percent=args.free_percent, free_order=args.free_order,
+                               keep_newest=args.keep_newest, max_dir_mb=args.max_dir_mb,
+                               gfs_dir=args.gfs_dir, gfs_keep=tuple(args.gfs_keep))
     
     # Exit with appropriate code
     sys.exit(0 if result['success'] else 1)
@@ -0,0 +1,36 @@
+import logging
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def logger():
+    return logging.getLogger('automation_toolkit.tests')
+
+
+@pytest.fixture
+def make_file():
+    """Create a file (and its parents) with the given size and age in days"""
+    def make(path, size=0, age_days=0, data=None):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data if data is not None else b'x' * size)
+        if age_days:
+            stamp = time.time() - age_days * 86400
+            os.utime(path, (stamp, stamp))
+        return str(path)
+    return make
+
+
+def tree_files(root):
+    """Relative paths of every file below root"""
+    found = set()
+    for dir_path, _, names in os.walk(root):
+        for name in names:
+            found.add(os.path.relpath(os.path.join(dir_path, name), root))
+    return found
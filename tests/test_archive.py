@@ -0,0 +1,75 @@
+import os
+import tarfile
+from datetime import datetime
+
+import pytest
+from conftest import tree_files
+
+import automation_toolkit
+from automation_toolkit import FileManager
+
+
+@pytest.fixture
+def old_files(tmp_path, make_file):
+    root = tmp_path / 'data'
+    contents = {}
+    for age in (40, 41):
+        for i in range(3):
+            data = os.urandom(300 * 1024) + bytes(f"{age}-{i}", 'ascii') * 1000
+            relpath = f"d{age}/f{i}.bin"
+            make_file(str(root / relpath), data=data, age_days=age)
+            contents[relpath] = data
+    make_file(str(root / 'fresh.txt'), data=b'fresh')
+    return root, contents
+
+
+def read_archives(paths, mode):
+    found = {}
+    for path in paths:
+        with tarfile.open(path, mode) as tar:
+            for member in tar.getmembers():
+                found[member.name] = tar.extractfile(member).read()
+    return found
+
+
+@pytest.mark.parametrize('compression', ['gz', 'xz'])
+def test_archive_round_trip(tmp_path, logger, old_files, compression):
+    root, contents = old_files
+    results = FileManager(logger, processes=2).archive_old_files(str(root), str(tmp_path / 'archive'), days=30,
+                                                                 compression=compression, level=1, chunk_mb=1)
+    assert results['errors'] == 0
+    assert results['archived'] == 6
+    assert len(results['archives']) == 2
+    assert all(path.endswith(f".tar.{compression}") for path in results['archives'])
+    assert read_archives(results['archives'], f"r:{compression}") == contents
+    assert tree_files(str(root)) == {'fresh.txt'}
+
+
+def test_existing_archives_are_never_overwritten_or_removed(tmp_path, logger, old_files, monkeypatch):
+    root, contents = old_files
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls(2026, 1, 1, 12, 0, 0)
+
+    monkeypatch.setattr(automation_toolkit, 'datetime', FrozenDatetime)
+    archive_dir = tmp_path / 'archive'
+    archive_dir.mkdir()
+    day = FrozenDatetime.fromtimestamp(os.stat(str(root / 'd40' / 'f0.bin')).st_mtime).strftime('%Y%m%d')
+    for name in (f"archive-{day}.tar.gz", f"archive-{day}-120000.tar.gz"):
+        (archive_dir / name).write_bytes(b'earlier archive')
+
+    results = FileManager(logger).archive_old_files(str(root), str(archive_dir), days=30)
+    assert results['errors'] == 1
+    assert results['archived'] == 3
+    for name in (f"archive-{day}.tar.gz", f"archive-{day}-120000.tar.gz"):
+        assert (archive_dir / name).read_bytes() == b'earlier archive'
+    assert tree_files(str(root)) == {'fresh.txt', 'd40/f0.bin', 'd40/f1.bin', 'd40/f2.bin'}
+
+
+def test_unsupported_compression(tmp_path, logger, old_files):
+    root, _ = old_files
+    results = FileManager(logger).archive_old_files(str(root), str(tmp_path / 'archive'), compression='zip')
+    assert results['errors'] == 1
+    assert len(tree_files(str(root))) == 7
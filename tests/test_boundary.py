@@ -0,0 +1,61 @@
+import os
+import subprocess
+
+import pytest
+
+from automation_toolkit import FileManager, FilesystemBoundary, MountTable, TreeWalker
+
+
+def test_mount_table_unescapes_paths(tmp_path):
+    mountinfo = tmp_path / 'mountinfo'
+    mountinfo.write_text("36 25 0:32 / /mnt/my\\040disk rw,relatime shared:1 - ext4 /dev/sdb1 rw\n"
+                         "37 25 0:4 / /proc rw - proc proc rw\n")
+    mounts = MountTable(str(mountinfo))
+    assert mounts.mounts['/mnt/my disk'] == (os.makedev(0, 32), 'ext4')
+    assert mounts.fstypes[os.makedev(0, 4)] == 'proc'
+
+
+def test_skip_fstypes_prunes_directories_by_device(tmp_path, logger):
+    (tmp_path / 'keep').mkdir()
+    (tmp_path / 'keep' / 'f').write_text('x')
+    mounts = MountTable(os.devnull)
+    mounts.fstypes[os.stat(str(tmp_path)).st_dev] = 'proc'
+    walker = TreeWalker(logger, boundary=FilesystemBoundary(skip_fstypes={'proc'}, mounts=mounts))
+    assert [entry.name for entry in walker.walk(str(tmp_path))] == []
+
+
+def test_network_fstypes_are_opt_in(tmp_path, logger, make_file):
+    make_file(str(tmp_path / 'share' / 'f'))
+    mounts = MountTable(os.devnull)
+    mounts.fstypes[os.stat(str(tmp_path / 'share')).st_dev] = 'nfs4'
+    default = TreeWalker(logger, boundary=FilesystemBoundary(mounts=mounts))
+    assert [entry.name for entry in default.walk(str(tmp_path))] == ['share', 'f']
+    fstypes = FilesystemBoundary.PSEUDO_FSTYPES | FilesystemBoundary.NETWORK_FSTYPES
+    skip_network = FilesystemBoundary(skip_fstypes=fstypes, mounts=mounts)
+    assert [entry.name for entry in TreeWalker(logger, boundary=skip_network).walk(str(tmp_path))] == []
+
+
+@pytest.fixture
+def bind_mount(tmp_path):
+    """tmp_path/root with a same-device bind mount at root/bound; skipped where mounting is not allowed"""
+    source = tmp_path / 'source'
+    (source / 'inner').mkdir(parents=True)
+    (source / 'inner' / 'f.bin').write_bytes(b'x' * 2 * 1024 * 1024)
+    root = tmp_path / 'root'
+    (root / 'bound').mkdir(parents=True)
+    (root / 'local.bin').write_bytes(b'x' * 2 * 1024 * 1024)
+    if os.geteuid() != 0 or subprocess.run(['mount', '--bind', str(source), str(root / 'bound')],
+                                           capture_output=True).returncode:
+        pytest.skip('bind mounts need root')
+    yield root
+    subprocess.run(['umount', str(root / 'bound')], capture_output=True)
+
+
+def test_one_filesystem_skips_bind_mounts_under_relative_roots(bind_mount, logger, monkeypatch):
+    monkeypatch.chdir(str(bind_mount.parent))
+    file_mgr = FileManager(logger, boundary=FilesystemBoundary(one_filesystem=True))
+    found = [os.path.basename(match['path']) for match in file_mgr.find_large_files('root', 1)]
+    assert found == ['local.bin']
+    removed = file_mgr.remove_tree('root', keep_root=True)
+    assert removed['kept'] == 1
+    assert os.path.exists(str(bind_mount.parent / 'source' / 'inner' / 'f.bin'))
@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+
+from conftest import tree_files
+
+from automation_toolkit import FileManager, TreeWalker
+
+MB = 1024 * 1024
+
+
+def test_on_dir_exit_runs_post_order(tmp_path, logger, make_file):
+    make_file(str(tmp_path / 'a' / 'b' / 'f'))
+    (tmp_path / 'a' / 'c').mkdir()
+    exits = []
+    list(TreeWalker(logger).walk(str(tmp_path), on_dir_exit=lambda path, remaining: exits.append(
+        (os.path.relpath(path, str(tmp_path)), remaining))))
+    assert exits.index(('a/b', 1)) < exits.index(('a', 2))
+    assert exits.index(('a/c', 0)) < exits.index(('a', 2))
+    assert exits[-1] == ('.', 1)
+
+
+def test_cleanup_pipeline_runs_all_stages_in_one_walk(tmp_path, logger, make_file):
+    root = tmp_path / 'data'
+    make_file(str(root / 'logs' / 'old.log'), size=10, age_days=40)
+    make_file(str(root / 'logs' / 'current.log'), size=2 * MB)
+    make_file(str(root / 'stale' / 'deep' / 'old.tmp'), size=10, age_days=40)
+    (root / 'empty' / 'nested').mkdir(parents=True)
+    results = FileManager(logger).cleanup_pipeline(str(root), days=30, size_mb=1)
+    assert results['old_file_cleanup']['deleted'] == 2
+    assert results['old_file_cleanup']['errors'] == 0
+    assert [os.path.relpath(match['path'], str(root)) for match in results['large_files']] == ['logs/current.log']
+    assert results['empty_dir_cleanup']['removed'] == 4
+    assert tree_files(str(root)) == {'logs/current.log'}
+    assert sorted(os.listdir(str(root))) == ['logs']
+
+
+def test_cleanup_pipeline_can_keep_empty_dirs(tmp_path, logger, make_file):
+    make_file(str(tmp_path / 'stale' / 'old.tmp'), age_days=40)
+    results = FileManager(logger).cleanup_pipeline(str(tmp_path), days=30, prune_empty=False)
+    assert results['old_file_cleanup']['deleted'] == 1
+    assert results['empty_dir_cleanup']['removed'] == 0
+    assert os.path.isdir(str(tmp_path / 'stale'))
+
+
+def test_cleanup_empty_dirs_cascades_upwards(tmp_path, logger, make_file):
+    root = tmp_path / 'data'
+    (root / 'a' / 'b' / 'c').mkdir(parents=True)
+    (root / 'a' / 'd').mkdir()
+    make_file(str(root / 'kept' / 'sub' / 'file.txt'))
+    (root / 'kept' / 'empty').mkdir()
+    results = FileManager(logger).cleanup_empty_dirs(str(root))
+    assert results == {'removed': 5, 'errors': 0}
+    assert sorted(os.listdir(str(root))) == ['kept']
+    assert sorted(os.listdir(str(root / 'kept'))) == ['sub']
+
+
+def test_large_files_are_truncated_before_unlink_even_with_processes(tmp_path, logger, make_file):
+    make_file(str(tmp_path / 'a' / 'big.bin'), size=3 * MB, age_days=40)
+    make_file(str(tmp_path / 'b' / 'small.log'), size=10, age_days=40)
+    file_mgr = FileManager(logger, processes=2, truncate_above_mb=1, truncate_step_mb=1)
+    assert not file_mgr._can_shard()
+    truncated = []
+    truncate = file_mgr._truncate_in_steps
+    file_mgr._truncate_in_steps = lambda path: truncated.append(os.path.relpath(path, str(tmp_path))) or truncate(path)
+    results = file_mgr.cleanup_old_files(str(tmp_path), days=30)
+    assert (results['deleted'], results['errors']) == (2, 0)
+    assert truncated == ['a/big.bin']
+    assert tree_files(str(tmp_path)) == set()
+
+
+def test_truncation_never_blocks_deleting_read_only_files(make_file, logger):
+    # pytest's tmp_path is private to root, so the unprivileged child works in its own directory
+    work = tempfile.mkdtemp()
+    path = make_file(os.path.join(work, 'readonly.bin'), size=3 * MB, age_days=40)
+    os.chmod(path, 0o444)
+    os.chown(work, 65534, 65534)
+    os.chown(path, 65534, 65534)
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.setgid(65534)
+            os.setuid(65534)
+            results = FileManager(logger, truncate_above_mb=1).cleanup_old_files(work, days=30)
+            os._exit(0 if (results['deleted'], results['errors']) == (1, 0) else 1)
+        except BaseException:
+            os._exit(2)
+    _, status = os.waitpid(pid, 0)
+    deleted = not os.path.exists(path)
+    shutil.rmtree(work)
+    assert os.WEXITSTATUS(status) == 0
+    assert deleted
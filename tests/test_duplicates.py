@@ -0,0 +1,83 @@
+import os
+
+import pytest
+
+from automation_toolkit import FileManager, HashCache
+
+KB = 1024
+
+
+@pytest.fixture
+def dup_tree(tmp_path, make_file):
+    body = os.urandom(64 * KB)
+    make_file(str(tmp_path / 'a' / 'copy1.bin'), data=body)
+    make_file(str(tmp_path / 'b' / 'copy2.bin'), data=body)
+    make_file(str(tmp_path / 'b' / 'copy3.bin'), data=body)
+    make_file(str(tmp_path / 'a' / 'same-ends.bin'), data=body[:32 * KB] + b'X' + body[32 * KB + 1:])
+    make_file(str(tmp_path / 'a' / 'other-size.bin'), data=body + b'!')
+    make_file(str(tmp_path / 'a' / 'small1.txt'), data=b'hello')
+    make_file(str(tmp_path / 'b' / 'small2.txt'), data=b'hello')
+    os.link(str(tmp_path / 'a' / 'copy1.bin'), str(tmp_path / 'a' / 'hardlink.bin'))
+    return tmp_path
+
+
+def group_names(results, root):
+    return sorted(sorted(os.path.relpath(path, str(root)) for path in group['paths']) for group in results['groups'])
+
+
+def test_duplicates_are_found_in_stages(logger, dup_tree):
+    results = FileManager(logger).find_duplicates(str(dup_tree))
+    assert results['errors'] == 0
+    assert len(group_names(results, dup_tree)) == 2
+    big = max(results['groups'], key=lambda group: group['size_mb'])
+    assert len(big['paths']) == 3
+    assert not any('same-ends' in path or 'other-size' in path for path in big['paths'])
+    assert results['duplicate_files'] == 3
+    stages = results['stages']
+    assert (stages['scanned'], stages['size_candidates'], stages['partial_candidates'], stages['full_hashed']) == \
+        (8, 6, 6, 4)
+
+
+def test_min_size_skips_small_files(logger, dup_tree):
+    results = FileManager(logger).find_duplicates(str(dup_tree), min_size_mb=0.01)
+    assert len(results['groups']) == 1
+    assert results['wasted_mb'] == round(2 * 64 * KB / (1024 * 1024), 2)
+
+
+def test_hash_cache_serves_unchanged_files(tmp_path, logger, dup_tree):
+    cache = HashCache(str(tmp_path / 'hashes.db'), logger)
+    file_mgr = FileManager(logger, hash_cache=cache)
+    first = file_mgr.find_duplicates(str(dup_tree))
+    assert (cache.hits, cache.misses) == (0, 10)
+    second = file_mgr.find_duplicates(str(dup_tree))
+    assert group_names(second, dup_tree) == group_names(first, dup_tree)
+    assert cache.hits == 10
+
+    with open(str(dup_tree / 'b' / 'copy3.bin'), 'r+b') as f:
+        f.seek(40 * KB)
+        f.write(b'changed')
+    third = file_mgr.find_duplicates(str(dup_tree))
+    assert cache.misses == 12
+    assert sum(len(group['paths']) for group in third['groups']) == 4
+    cache.close()
+
+
+def test_hash_cache_keys_on_file_identity_and_evicts(tmp_path, logger):
+    path = tmp_path / 'f'
+    path.write_bytes(b'one')
+    cache = HashCache(str(tmp_path / 'hashes.db'), logger, max_entries=2)
+    st = os.stat(str(path))
+    cache.put(st, 'full', 'digest-one')
+    assert cache.get(st, 'full') == 'digest-one'
+    assert cache.get(st, 'partial') is None
+    path.write_bytes(b'three')
+    assert cache.get(os.stat(str(path)), 'full') is None
+
+    for i in range(3):
+        other = tmp_path / f"other{i}"
+        other.write_bytes(b'x')
+        cache.put(os.stat(str(other)), 'full', f"digest-{i}")
+        cache.commit()
+    digests = {row[0] for row in cache.conn.execute("SELECT digest FROM hashes")}
+    assert digests == {'digest-1', 'digest-2'}
+    cache.close()
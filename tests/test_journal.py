@@ -0,0 +1,139 @@
+import json
+import os
+
+import pytest
+from conftest import tree_files
+
+from automation_toolkit import FileManager, OperationJournal
+
+
+@pytest.fixture
+def journal_path(tmp_path):
+    return str(tmp_path / 'ops.journal')
+
+
+def test_unfinished_run_is_resumed(journal_path, logger):
+    journal = OperationJournal(journal_path, logger)
+    run_id = journal.begin('cleanup_old_files', '/srv/data', {'days': 30})
+    journal.record('dir_done', '/srv/data/a')
+    journal.record('move_intent', '/srv/data/x', dst='/srv/data/txt/x')
+    journal.close()
+
+    journal = OperationJournal(journal_path, logger)
+    assert journal.begin('cleanup_old_files', '/srv/data', {'days': 30}) == run_id
+    assert journal.resumed
+    assert journal.completed_dirs == {'/srv/data/a'}
+    assert journal.pending_moves == {'/srv/data/x': '/srv/data/txt/x'}
+    journal.end()
+
+    assert journal.begin('cleanup_old_files', '/srv/data', {'days': 30}) != run_id
+    assert not journal.resumed
+    assert journal.completed_dirs == set()
+    journal.close()
+
+
+def test_changed_params_start_a_fresh_run(journal_path, logger):
+    journal = OperationJournal(journal_path, logger)
+    run_id = journal.begin('cleanup_old_files', '/srv/data', {'days': 30})
+    journal.record('dir_done', '/srv/data/a')
+    journal.close()
+
+    journal = OperationJournal(journal_path, logger)
+    fresh = journal.begin('cleanup_old_files', '/srv/data', {'days': 7})
+    assert fresh != run_id
+    assert not journal.resumed
+    assert journal.completed_dirs == set()
+    journal.close()
+    begin = next(record for record in OperationJournal(journal_path, logger).entries(fresh))
+    assert begin['supersedes'] == run_id
+
+
+def test_sequence_continues_on_resume(journal_path, logger):
+    journal = OperationJournal(journal_path, logger)
+    run_id = journal.begin('remove_tree', '/srv/data')
+    journal.record('dir_done', '/srv/data/a')
+    journal.close()
+    journal = OperationJournal(journal_path, logger)
+    journal.begin('remove_tree', '/srv/data')
+    journal.record('dir_done', '/srv/data/b')
+    journal.end()
+    journal.close()
+    seqs = [record['seq'] for record in OperationJournal(journal_path, logger).entries(run_id)]
+    assert seqs == list(range(1, len(seqs) + 1))
+
+
+def test_run_index_is_rebuilt_when_missing(journal_path, logger):
+    journal = OperationJournal(journal_path, logger)
+    journal.begin('finished', '/srv/data')
+    journal.end()
+    run_id = journal.begin('cleanup_old_files', '/srv/data', {'days': 30})
+    journal.record('dir_done', '/srv/data/a')
+    journal.close()
+    os.unlink(journal_path + '.runs')
+
+    journal = OperationJournal(journal_path, logger)
+    assert journal.begin('cleanup_old_files', '/srv/data', {'days': 30}) == run_id
+    assert journal.completed_dirs == {'/srv/data/a'}
+    journal.begin('finished', '/srv/data')
+    assert not journal.resumed
+    journal.close()
+
+
+def test_journal_rotates_only_between_runs(journal_path, logger):
+    journal = OperationJournal(journal_path, logger)
+    journal.rotate_bytes = 1
+    journal.begin('remove_tree', '/srv/a')
+    journal.record('dir_done', '/srv/a/x')
+    journal.begin('remove_tree', '/srv/b')
+    assert not os.path.exists(journal_path + '.1')
+    journal.end()
+    with open(journal_path + '.runs') as f:
+        open_runs = json.load(f)
+    assert list(open_runs) == [f"remove_tree:{os.path.abspath('/srv/a')}"]
+    journal.close()
+
+    journal = OperationJournal(journal_path, logger)
+    journal.rotate_bytes = 1
+    journal.begin('remove_tree', '/srv/a')
+    journal.end()
+    journal.begin('remove_tree', '/srv/c')
+    assert os.path.exists(journal_path + '.1')
+    assert [record['op'] for record in journal.entries()] == ['begin']
+    journal.close()
+
+
+def test_cleanup_resume_skips_finished_directories(tmp_path, journal_path, logger, make_file):
+    target = tmp_path / 'data'
+    for name in ('a', 'b'):
+        make_file(str(target / name / 'old.log'), age_days=40)
+    journal = OperationJournal(journal_path, logger)
+    journal.begin('cleanup_old_files', str(target), {'days': 30})
+    journal.record('dir_done', str(target / 'a'))
+    journal.close()
+
+    journal = OperationJournal(journal_path, logger)
+    results = FileManager(logger, journal=journal).cleanup_old_files(str(target), days=30)
+    journal.close()
+    assert results['deleted'] == 1
+    assert tree_files(str(target)) == {'a/old.log'}
+
+    journal = OperationJournal(journal_path, logger)
+    journal.begin('cleanup_old_files', str(target), {'days': 30})
+    assert not journal.resumed
+    journal.close()
+
+
+def test_organize_finishes_interrupted_moves(tmp_path, journal_path, logger, make_file):
+    target = tmp_path / 'inbox'
+    make_file(str(target / 'a.txt'), data=b'copied')
+    make_file(str(target / 'txt' / 'a.txt'), data=b'copied')
+    journal = OperationJournal(journal_path, logger)
+    journal.begin('organize_by_extension', str(target))
+    journal.record('move_intent', str(target / 'a.txt'), dst=str(target / 'txt' / 'a.txt'))
+    journal.close()
+
+    journal = OperationJournal(journal_path, logger)
+    results = FileManager(logger, journal=journal).organize_by_extension(str(target))
+    journal.close()
+    assert results['errors'] == 0
+    assert tree_files(str(target)) == {'txt/a.txt'}
@@ -0,0 +1,148 @@
+import os
+import time
+
+import pytest
+
+from automation_toolkit import FileManager, IndexWatcher, MetadataIndex, PathFilter, TrashBin
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def index(tmp_path, logger):
+    index = MetadataIndex(str(tmp_path / 'index.db'), logger)
+    yield index
+    index.close()
+
+
+@pytest.fixture
+def data_tree(tmp_path, make_file):
+    root = tmp_path / 'data'
+    for name in ('a', 'b', 'build'):
+        make_file(str(root / name / 'large.bin'), size=2 * MB)
+        make_file(str(root / name / 'small.txt'), size=10, age_days=40)
+    return root
+
+
+def large_files(file_mgr, root):
+    return sorted(os.path.relpath(match['path'], str(root)) for match in file_mgr.find_large_files(str(root), 1))
+
+
+def test_refresh_only_relists_changed_directories(index, data_tree, make_file):
+    first = index.refresh(str(data_tree))
+    assert (first['dirs_scanned'], first['files_indexed']) == (4, 6)
+    make_file(str(data_tree / 'b' / 'new.txt'))
+    second = index.refresh(str(data_tree))
+    assert (second['dirs_scanned'], second['dirs_skipped'], second['files_indexed']) == (1, 3, 3)
+    assert index.refresh(str(data_tree), full=True)['dirs_scanned'] == 4
+
+
+def test_indexed_queries_match_walks(index, logger, data_tree, make_file):
+    walked = FileManager(logger)
+    indexed = FileManager(logger, index=index)
+    assert large_files(indexed, data_tree) == large_files(walked, data_tree)
+
+    os.unlink(str(data_tree / 'a' / 'large.bin'))
+    make_file(str(data_tree / 'c' / 'new.bin'), size=3 * MB)
+    assert large_files(indexed, data_tree) == large_files(walked, data_tree) == ['b/large.bin', 'build/large.bin',
+                                                                                  'c/new.bin']
+
+
+def test_files_growing_in_place_are_found(index, logger, data_tree):
+    indexed = FileManager(logger, index=index)
+    assert 'a/small.txt' not in large_files(indexed, data_tree)
+    dir_mtime = os.stat(str(data_tree / 'a')).st_mtime_ns
+    with open(str(data_tree / 'a' / 'small.txt'), 'ab') as f:
+        f.write(b'x' * 2 * MB)
+    assert os.stat(str(data_tree / 'a')).st_mtime_ns == dir_mtime
+    assert 'a/small.txt' in large_files(indexed, data_tree)
+    assert 'a/small.txt' in large_files(FileManager(logger), data_tree)
+
+
+def test_indexed_cleanup_old_files(index, logger, data_tree):
+    results = FileManager(logger, index=index).cleanup_old_files(str(data_tree), days=30)
+    assert results['deleted'] == 3
+    indexed = {os.path.relpath(path, str(data_tree))
+               for path, _, _ in index.query_old_files(str(data_tree), time.time() + 86400)}
+    assert indexed == {'a/large.bin', 'b/large.bin', 'build/large.bin'}
+
+
+def test_files_ordered_pages_through_the_index(index, data_tree):
+    index.refresh(str(data_tree))
+    by_age = [os.path.basename(path) for path, _, _ in index.iter_files_ordered(str(data_tree), time.time() + 60,
+                                                                                batch=2)]
+    assert by_age[:3] == ['small.txt'] * 3 and len(by_age) == 6
+    by_size = [size for _, size, _ in index.iter_files_ordered(str(data_tree), time.time() + 60, order='size',
+                                                               batch=2)]
+    assert by_size == sorted(by_size, reverse=True)
+
+
+@pytest.fixture
+def watcher(index, logger, data_tree):
+    try:
+        watcher = IndexWatcher(str(data_tree), index, logger)
+    except OSError:
+        pytest.skip('inotify is not available')
+    yield watcher
+    watcher.stop()
+
+
+def test_watcher_applies_events_without_rescans(watcher, index, logger, data_tree, make_file):
+    assert len(watcher.wd_paths) == 4
+    file_mgr = FileManager(logger, index=index, watcher=watcher)
+    make_file(str(data_tree / 'b' / 'added.bin'), size=2 * MB)
+    make_file(str(data_tree / 'new' / 'deep' / 'nested.bin'), size=2 * MB)
+    os.unlink(str(data_tree / 'a' / 'large.bin'))
+    assert large_files(file_mgr, data_tree) == ['b/added.bin', 'b/large.bin', 'build/large.bin',
+                                                'new/deep/nested.bin']
+    assert watcher.sync()['rescanned'] == 0
+
+
+def test_watcher_overflow_rescans_in_full(watcher, index, logger, data_tree, monkeypatch):
+    refreshes = []
+    refresh = index.refresh
+    monkeypatch.setattr(index, 'refresh', lambda root, full=False, walker=None: refreshes.append(full) or refresh(
+        root, full=full, walker=walker))
+    with open(str(data_tree / 'a' / 'small.txt'), 'ab') as f:
+        f.write(b'x' * 2 * MB)
+    while True:
+        try:
+            os.read(watcher.fd, watcher.READ_SIZE)
+        except BlockingIOError:
+            break
+    watcher.needs_full_rescan = True
+    assert watcher.sync()['rescanned'] == 1
+    assert refreshes == [True]
+    assert 'a/small.txt' in large_files(FileManager(logger, index=index, watcher=watcher), data_tree)
+
+
+def test_index_drops_rows_of_newly_excluded_trees(index, logger, data_tree):
+    assert len(large_files(FileManager(logger, index=index), data_tree)) == 3
+    filtered = FileManager(logger, index=index, path_filter=PathFilter(['build']))
+    assert large_files(filtered, data_tree) == ['a/large.bin', 'b/large.bin']
+    rows = index.query_large_files(str(data_tree), MB)
+    assert not any('/build/' in path for path, _, _ in rows)
+
+
+def test_filter_is_not_applied_above_a_nested_root(index, logger, data_tree):
+    file_mgr = FileManager(logger, index=index, path_filter=PathFilter(['build']))
+    walked = FileManager(logger, path_filter=PathFilter(['build']))
+    assert large_files(file_mgr, data_tree / 'build') == large_files(walked, data_tree / 'build') == ['large.bin']
+
+
+def test_watcher_skips_excluded_dirs(index, logger, data_tree, make_file):
+    path_filter = PathFilter(['build'])
+    trash = TrashBin(str(data_tree / '.trash'), logger)
+    try:
+        watcher = IndexWatcher(str(data_tree), index, logger, path_filter=path_filter, skip_dirs={trash.trash_dir})
+    except OSError:
+        pytest.skip('inotify is not available')
+    try:
+        assert not any(path.endswith(('/build', '/.trash')) for path in watcher.wd_paths.values())
+        file_mgr = FileManager(logger, index=index, watcher=watcher, path_filter=path_filter, trash=trash)
+        make_file(str(data_tree / 'b' / 'added.bin'), size=2 * MB)
+        make_file(str(data_tree / 'build' / 'ignored.bin'), size=2 * MB)
+        os.unlink(str(data_tree / 'a' / 'large.bin'))
+        assert large_files(file_mgr, data_tree) == ['b/added.bin', 'b/large.bin']
+    finally:
+        watcher.stop()
@@ -0,0 +1,46 @@
+import os
+
+import pytest
+from conftest import tree_files
+
+from automation_toolkit import FileManager, PathFilter
+
+
+@pytest.fixture
+def inbox(tmp_path, make_file):
+    for name in ('a.txt', 'b.txt', 'c.log', 'README', 'clash.txt'):
+        make_file(str(tmp_path / name), data=name.encode())
+    make_file(str(tmp_path / 'txt' / 'clash.txt'), data=b'already here')
+    make_file(str(tmp_path / 'nested' / 'deep.txt'))
+    return tmp_path
+
+
+def test_organize_moves_top_level_files(logger, inbox):
+    results = FileManager(logger).organize_by_extension(str(inbox))
+    assert results['errors'] == 0
+    assert results['organized'] == 5
+    assert {'txt/a.txt', 'txt/b.txt', 'log/c.log', 'no_extension/README', 'nested/deep.txt'} <= tree_files(str(inbox))
+
+
+@pytest.mark.parametrize('move_workers', [1, 4])
+def test_planned_organize_skips_collisions(logger, inbox, move_workers):
+    results = FileManager(logger).organize_by_extension(str(inbox), planned=True, move_workers=move_workers)
+    assert (results['organized'], results['errors']) == (4, 0)
+    assert results['collisions'] == [os.path.join('txt', 'clash.txt')]
+    assert results['methods'] == {'rename': 4}
+    assert tree_files(str(inbox)) == {'txt/a.txt', 'txt/b.txt', 'txt/clash.txt', 'log/c.log', 'no_extension/README',
+                                      'clash.txt', 'nested/deep.txt'}
+    with open(str(inbox / 'txt' / 'clash.txt'), 'rb') as f:
+        assert f.read() == b'already here'
+    with open(str(inbox / 'txt' / 'a.txt'), 'rb') as f:
+        assert f.read() == b'a.txt'
+
+
+@pytest.mark.parametrize('planned', [False, True])
+def test_organize_leaves_filtered_files_alone(logger, inbox, make_file, planned):
+    make_file(str(inbox / 'keep.pinned'))
+    results = FileManager(logger, path_filter=PathFilter(['*.pinned'])).organize_by_extension(str(inbox),
+                                                                                           planned=planned)
+    assert results['errors'] == 0
+    assert 'keep.pinned' in tree_files(str(inbox))
+    assert not (inbox / 'pinned').exists()
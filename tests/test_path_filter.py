@@ -0,0 +1,27 @@
+from automation_toolkit import PathFilter
+
+
+def test_load_reads_excludes_includes_and_comments(tmp_path):
+    filter_path = tmp_path / 'filter.txt'
+    filter_path.write_text("# build output\nnode_modules\n*.pyc\n/srv/data/private\n!*.log\n\n")
+    path_filter = PathFilter.load(str(filter_path), excludes=['.git'])
+    assert not path_filter.allows('/srv/app/.git', '.git', True)
+    assert not path_filter.allows('/srv/app/node_modules', 'node_modules', True)
+    assert not path_filter.allows('/srv/data/private', 'private', True)
+    assert not path_filter.allows('/srv/app/x.pyc', 'x.pyc', False)
+    assert not path_filter.allows('/srv/app/x.txt', 'x.txt', False)
+    assert path_filter.allows('/srv/app/x.log', 'x.log', False)
+    assert path_filter.allows('/srv/app/src', 'src', True)
+
+
+def test_path_globs_match_absolute_paths():
+    path_filter = PathFilter(['*/customers/*'])
+    assert not path_filter.allows('/srv/customers/acme', 'acme', True)
+    assert path_filter.allows('/srv/customers', 'customers', True)
+
+
+def test_allows_path_checks_ancestors_below_root_only():
+    path_filter = PathFilter(['build'])
+    assert not path_filter.allows_path('/tmp/scan/build/out.o', '/tmp/scan')
+    assert path_filter.allows_path('/tmp/build/data/out.o', '/tmp/build/data')
+    assert path_filter.allows_path('/tmp/build/data/sub/out.o', '/tmp/build/data/')
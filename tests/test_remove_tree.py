@@ -0,0 +1,101 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from conftest import tree_files
+
+from automation_toolkit import FileManager, IOThrottle, PathFilter, TrashBin
+
+
+@pytest.fixture
+def deep_tree(tmp_path, make_file):
+    root = tmp_path / 'victim'
+    for top in range(3):
+        for sub in range(3):
+            for i in range(5):
+                make_file(str(root / f"t{top}" / f"s{sub}" / f"f{i}.dat"), size=16)
+            make_file(str(root / f"t{top}" / f"s{sub}" / 'keep.cfg'), size=16)
+    (root / 'empty' / 'deeper').mkdir(parents=True)
+    os.symlink('/etc', str(root / 't0' / 'etc-link'))
+    return root
+
+
+def open_fds():
+    return len(os.listdir('/proc/self/fd'))
+
+
+def test_remove_tree_removes_everything(deep_tree, logger):
+    fds = open_fds()
+    results = FileManager(logger).remove_tree(str(deep_tree), workers=4)
+    assert results['errors'] == 0
+    assert results['files_removed'] == 55
+    assert results['dirs_removed'] == 15
+    assert not os.path.lexists(str(deep_tree))
+    assert os.path.isdir('/etc')
+    assert open_fds() == fds
+
+
+def test_keep_root(deep_tree, logger):
+    results = FileManager(logger).remove_tree(str(deep_tree), keep_root=True)
+    assert results['errors'] == 0
+    assert os.listdir(str(deep_tree)) == []
+
+
+def test_path_fallback_past_the_held_fd_limit(deep_tree, logger):
+    file_mgr = FileManager(logger)
+    file_mgr.REMOVE_HELD_FDS = 1
+    fds = open_fds()
+    results = file_mgr.remove_tree(str(deep_tree), workers=4)
+    assert (results['files_removed'], results['dirs_removed'], results['errors']) == (55, 15, 0)
+    assert not os.path.lexists(str(deep_tree))
+    assert open_fds() == fds
+
+
+def test_checked_entries_take_the_same_route(deep_tree, logger):
+    results = FileManager(logger, throttle=IOThrottle(logger, ops_per_sec=0)).remove_tree(str(deep_tree), workers=2)
+    assert (results['files_removed'], results['dirs_removed'], results['errors']) == (55, 15, 0)
+    assert not os.path.lexists(str(deep_tree))
+
+
+def test_unremovable_entries_keep_their_parents(deep_tree, logger, monkeypatch):
+    unlink = os.unlink
+
+    def refuse_keep_cfg(name, *args, **kwargs):
+        if name == 'keep.cfg':
+            raise PermissionError(1, 'Operation not permitted', name)
+        return unlink(name, *args, **kwargs)
+
+    monkeypatch.setattr(os, 'unlink', refuse_keep_cfg)
+    results = FileManager(logger).remove_tree(str(deep_tree), workers=4)
+    monkeypatch.undo()
+    assert results['errors'] == 9
+    assert results['files_removed'] == 46
+    assert sorted(os.listdir(str(deep_tree))) == ['t0', 't1', 't2']
+    assert os.listdir(str(deep_tree / 't0' / 's0')) == ['keep.cfg']
+
+
+def test_filtered_entries_and_their_parents_are_kept(deep_tree, logger):
+    results = FileManager(logger, path_filter=PathFilter(['*.cfg', 'empty'])).remove_tree(str(deep_tree))
+    assert results['errors'] == 0
+    assert results['kept'] == 10
+    expected = {f"t{top}/s{sub}/keep.cfg" for top in range(3) for sub in range(3)}
+    assert tree_files(str(deep_tree)) == expected
+    assert os.path.isdir(str(deep_tree / 'empty' / 'deeper'))
+
+
+def test_filtered_tree_is_never_deferred(tmp_path, deep_tree, logger):
+    trash = TrashBin(str(tmp_path / '.trash'), logger)
+    file_mgr = FileManager(logger, trash=trash, path_filter=PathFilter(['keep.cfg']))
+    file_mgr.remove_tree(str(deep_tree), defer=True)
+    assert len(tree_files(str(deep_tree))) == 9
+    assert os.listdir(str(tmp_path / '.trash')) == []
+
+
+def test_shared_pool_is_left_open(tmp_path, make_file, logger):
+    file_mgr = FileManager(logger)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        for name in ('one', 'two'):
+            make_file(str(tmp_path / name / 'sub' / 'f'), size=1)
+            assert file_mgr.remove_tree(str(tmp_path / name), pool=pool)['errors'] == 0
+        assert pool.submit(lambda: 42).result() == 42
+    assert os.listdir(str(tmp_path)) == []
@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+from automation_toolkit import FileManager
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def sized_tree(tmp_path, make_file):
+    for i in range(1, 7):
+        make_file(str(tmp_path / f"d{i % 3}" / f"f{i}.bin"), size=i * MB + 1)
+    make_file(str(tmp_path / 'small.txt'), size=10)
+    return tmp_path
+
+
+@pytest.mark.parametrize('workers,processes', [(1, 0), (4, 0), (1, 2)])
+def test_top_n_returns_the_largest_first(logger, sized_tree, workers, processes):
+    file_mgr = FileManager(logger, workers=workers, processes=processes)
+    top = file_mgr.find_large_files(str(sized_tree), 1, top_n=3)
+    assert [os.path.basename(match['path']) for match in top] == ['f6.bin', 'f5.bin', 'f4.bin']
+    assert top[0]['size_mb'] == 6.0
+    assert len(file_mgr.find_large_files(str(sized_tree), 1)) == 6
+
+
+def test_iter_large_files_streams_matches(logger, sized_tree):
+    stream = FileManager(logger).iter_large_files(str(sized_tree), 3)
+    first = next(stream)
+    assert first['size_mb'] >= 3
+    names = {os.path.basename(first['path'])} | {os.path.basename(match['path']) for match in stream}
+    assert names == {'f3.bin', 'f4.bin', 'f5.bin', 'f6.bin'}
+
+
+def test_directory_usage_aggregates_bottom_up(tmp_path, logger, make_file):
+    make_file(str(tmp_path / 'a' / 'one.bin'), size=2 * MB)
+    make_file(str(tmp_path / 'a' / 'b' / 'two.bin'), size=3 * MB)
+    make_file(str(tmp_path / 'c' / 'three.bin'), size=1 * MB)
+    os.link(str(tmp_path / 'a' / 'one.bin'), str(tmp_path / 'a' / 'hardlink.bin'))
+    with open(str(tmp_path / 'c' / 'sparse.img'), 'wb') as f:
+        f.truncate(8 * MB)
+    usage = FileManager(logger).directory_usage(str(tmp_path), top_n=3)
+    assert usage['errors'] == 0
+    assert (usage['files'], usage['dirs']) == (4, 4)
+    assert 14 <= usage['apparent_mb'] < 14.1
+    assert 6 <= usage['allocated_mb'] < 6.1
+    top = {os.path.relpath(node['path'], str(tmp_path)): node for node in usage['top']}
+    assert list(top) == ['.', 'a', 'a/b']
+    assert top['a']['own_apparent_mb'] == pytest.approx(2, abs=0.05)
+    assert top['a']['apparent_mb'] == pytest.approx(5, abs=0.05)
+    assert [node['path'] for node in usage['tree']] == [str(tmp_path)]
+    assert [child['path'] for child in usage['tree'][0]['children']] == [str(tmp_path / 'a')]
+    assert usage['tree'][0]['children'][0]['children'][0]['path'] == str(tmp_path / 'a' / 'b')
@@ -0,0 +1,178 @@
+import itertools
+import os
+import stat
+
+import pytest
+from conftest import tree_files
+
+import automation_toolkit
+from automation_toolkit import FileManager, MetadataIndex, OperationJournal, RetentionPolicy, TreeWalker
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def policy_tree(tmp_path, make_file):
+    root = tmp_path / 'data'
+    make_file(str(root / 'logs' / 'old.log'), size=10, age_days=40)
+    make_file(str(root / 'logs' / 'new.log'), size=10)
+    make_file(str(root / 'tmp' / 'scratch.tmp'), size=10, age_days=2)
+    make_file(str(root / 'reports' / 'q1.csv'), size=10, age_days=100)
+    make_file(str(root / 'shared' / 'open.txt'), size=10)
+    os.chmod(str(root / 'shared' / 'open.txt'), 0o666)
+    return root
+
+
+POLICY = [
+    {'name': 'old-logs', 'action': 'delete', 'glob': '*.log', 'older_than_days': 30},
+    {'name': 'scratch', 'action': 'delete', 'path': 'tmp', 'older_than_days': 1},
+    {'name': 'reports', 'action': 'archive', 'glob': '*.csv', 'older_than_days': 90},
+    {'name': 'lock-down', 'action': 'chmod', 'path': 'shared', 'mode': '0640'},
+]
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_apply_policy(tmp_path, policy_tree, logger, workers):
+    results = FileManager(logger, workers=workers).apply_policy(str(policy_tree), RetentionPolicy(POLICY),
+                                                                 archive_dir=str(tmp_path / 'archive'))
+    assert results['errors'] == 0
+    assert (results['deleted'], results['archived'], results['changed']) == (3, 1, 1)
+    assert tree_files(str(policy_tree)) == {'logs/new.log', 'shared/open.txt'}
+    assert stat.S_IMODE(os.stat(str(policy_tree / 'shared' / 'open.txt')).st_mode) == 0o640
+    assert len(os.listdir(str(tmp_path / 'archive'))) == 1
+
+
+def test_apply_policy_dry_run_changes_nothing(tmp_path, policy_tree, logger):
+    before = tree_files(str(policy_tree))
+    results = FileManager(logger).apply_policy(str(policy_tree), RetentionPolicy(POLICY),
+                                               archive_dir=str(tmp_path / 'archive'), dry_run=True)
+    assert {item['rule'] for item in results['reported']} == {'old-logs', 'scratch', 'reports', 'lock-down'}
+    assert tree_files(str(policy_tree)) == before
+
+
+def test_invalid_rules_are_rejected():
+    with pytest.raises(ValueError):
+        RetentionPolicy([{'name': 'bad', 'action': 'shred'}])
+    with pytest.raises(ValueError):
+        RetentionPolicy([{'name': 'bad', 'action': 'chmod'}])
+
+
+def test_policy_dry_run_leaves_journal_untouched(tmp_path, logger, make_file):
+    journal_path = str(tmp_path / 'ops.journal')
+    for name in ('a', 'b'):
+        make_file(str(tmp_path / 'data' / name / 'old.log'), age_days=40)
+    policy = RetentionPolicy([{'name': 'old', 'action': 'delete', 'glob': '*.log', 'older_than_days': 30}])
+    for workers in (1, 4):
+        journal = OperationJournal(journal_path, logger)
+        results = FileManager(logger, workers=workers, journal=journal).apply_policy(
+            str(tmp_path / 'data'), policy, dry_run=True)
+        journal.close()
+        assert results['errors'] == 0
+        assert len(results['reported']) == 2
+    assert os.path.getsize(journal_path) == 0
+    assert tree_files(str(tmp_path / 'data')) == {'a/old.log', 'b/old.log'}
+
+
+def test_keep_newest_per_directory(tmp_path, logger, make_file):
+    for name in ('a', 'b'):
+        for age in range(1, 6):
+            make_file(str(tmp_path / name / f"backup-{age}"), age_days=age)
+    results = FileManager(logger).cleanup_by_retention(str(tmp_path), keep_newest=2)
+    assert (results['deleted'], results['kept']) == (6, 4)
+    assert tree_files(str(tmp_path)) == {f"{name}/backup-{age}" for name in 'ab' for age in (1, 2)}
+
+
+@pytest.mark.parametrize('order', list(itertools.permutations('ABC')))
+def test_size_retention_is_independent_of_listing_order(tmp_path, logger, make_file, monkeypatch, order):
+    make_file(str(tmp_path / 'A'), size=6 * MB, age_days=1)
+    make_file(str(tmp_path / 'B'), size=6 * MB, age_days=2)
+    make_file(str(tmp_path / 'C'), size=1 * MB, age_days=3)
+    walk = TreeWalker.walk
+
+    def ordered_walk(self, root, on_dir_exit=None):
+        entries = list(walk(self, root, on_dir_exit))
+        return iter(sorted(entries, key=lambda entry: order.index(entry.name)))
+
+    monkeypatch.setattr(TreeWalker, 'walk', ordered_walk)
+    results = FileManager(logger).cleanup_by_retention(str(tmp_path), max_total_mb=10)
+    assert results['errors'] == 0
+    assert tree_files(str(tmp_path)) == {'A'}
+
+
+@pytest.mark.parametrize('workers', [1, 8])
+def test_gfs_keeps_daily_weekly_monthly(tmp_path, logger, monkeypatch, workers):
+    pools = []
+    executor = automation_toolkit.ThreadPoolExecutor
+
+    def recording_executor(max_workers=None, **kwargs):
+        pools.append(max_workers)
+        return executor(max_workers=max_workers, **kwargs)
+
+    monkeypatch.setattr(automation_toolkit, 'ThreadPoolExecutor', recording_executor)
+    for month in (1, 2, 3):
+        for day in range(1, 29):
+            (tmp_path / f"snap-2026-{month:02d}-{day:02d}").mkdir()
+            (tmp_path / f"snap-2026-{month:02d}-{day:02d}" / 'data').write_text('x')
+    results = FileManager(logger).cleanup_gfs(str(tmp_path), daily=3, weekly=2, monthly=3, workers=workers)
+    assert pools == [workers]
+    assert results['errors'] == 0
+    kept = set(os.listdir(str(tmp_path)))
+    assert kept == set(results['kept'])
+    assert {'snap-2026-03-28', 'snap-2026-03-27', 'snap-2026-03-26', 'snap-2026-03-22',
+            'snap-2026-02-28', 'snap-2026-01-28'} == kept
+    assert results['deleted'] == 84 - len(kept)
+
+
+def test_gfs_dry_run_and_bad_pattern(tmp_path, logger):
+    for day in range(1, 5):
+        (tmp_path / f"db-2026-05-0{day}.sql").write_text('x')
+    file_mgr = FileManager(logger)
+    results = file_mgr.cleanup_gfs(str(tmp_path), daily=1, weekly=0, monthly=0, dry_run=True)
+    assert len(results['details']) == 3
+    assert len(os.listdir(str(tmp_path))) == 4
+    results = file_mgr.cleanup_gfs(str(tmp_path), daily=1, weekly=0, monthly=0,
+                                   name_pattern=r'(?P<year>\d{4})-(?P<month>\d{2})')
+    assert results['errors'] == 1
+    assert len(os.listdir(str(tmp_path))) == 4
+
+
+class FakeDisk:
+    """check_disk_usage stand-in: free space grows as files under root are deleted"""
+
+    def __init__(self, root, total_mb, free_mb):
+        self.root = root
+        self.total = total_mb * MB
+        self.base_free = free_mb * MB
+        self.base_used = self.used()
+
+    def used(self):
+        return sum(os.lstat(os.path.join(d, n)).st_blocks * 512 for d, _, names in os.walk(self.root) for n in names)
+
+    def check_disk_usage(self, path):
+        free = self.base_free + self.base_used - self.used()
+        return {'total': self.total / 1024 ** 3, 'free': free / 1024 ** 3, 'used': (self.total - free) / 1024 ** 3,
+                'percent': 100 - free * 100 / self.total, 'success': True}
+
+
+@pytest.mark.parametrize('use_index', [False, True])
+def test_cleanup_until_free_by_age(tmp_path, logger, make_file, use_index):
+    root = tmp_path / 'data'
+    for age in range(2, 8):
+        make_file(str(root / f"d{age % 2}" / f"f{age}"), size=MB, age_days=age)
+    make_file(str(root / 'fresh'), size=MB)
+    disk = FakeDisk(str(root), total_mb=100, free_mb=7.5)
+    index = MetadataIndex(str(tmp_path / 'index.db'), logger) if use_index else None
+    results = FileManager(logger, index=index).cleanup_until_free(str(root), 10, sys_ops=disk)
+    assert results['target_met']
+    assert results['deleted'] == 3
+    assert tree_files(str(root)) == {'fresh', 'd0/f2', 'd1/f3', 'd0/f4'}
+
+
+def test_cleanup_until_free_by_size(tmp_path, logger, make_file):
+    root = tmp_path / 'data'
+    for size in range(1, 5):
+        make_file(str(root / f"f{size}"), size=size * MB, age_days=2)
+    disk = FakeDisk(str(root), total_mb=100, free_mb=6)
+    results = FileManager(logger).cleanup_until_free(str(root), 10, order='size', sys_ops=disk)
+    assert results['target_met']
+    assert tree_files(str(root)) == {'f1', 'f2', 'f3'}
@@ -0,0 +1,41 @@
+import threading
+
+from conftest import tree_files
+
+from automation_toolkit import FileManager, IOThrottle
+
+
+def run_in_thread(target):
+    """Throttled calls renice their thread, so keep them off the test runner's thread"""
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+
+
+def test_rate_limit_delays_operations(logger):
+    throttle = IOThrottle(logger, ops_per_sec=100)
+    run_in_thread(lambda: [throttle.acquire() for _ in range(120)])
+    assert throttle.waited > 0.1
+
+
+def test_slow_operations_back_off_and_recover(logger):
+    throttle = IOThrottle(logger, ops_per_sec=100, latency_target=0.01)
+    throttle.observe(0.5)
+    throttle.observe(0.5)
+    assert throttle.scale == 0.25
+    for _ in range(100):
+        throttle.observe(0.001)
+    assert throttle.scale == 1.0
+
+
+def test_idle_priority_is_applied_per_worker_thread(tmp_path, logger, make_file):
+    for i in range(40):
+        make_file(str(tmp_path / 'victim' / f"d{i}" / 'f'), size=1, age_days=40)
+    throttle = IOThrottle(logger, idle_priority=True, niceness=0)
+    results = {}
+    run_in_thread(lambda: results.update(FileManager(logger, workers=4, throttle=throttle).cleanup_old_files(
+        str(tmp_path / 'victim'), days=30)))
+    assert (results['deleted'], results['errors']) == (40, 0)
+    assert tree_files(str(tmp_path)) == set()
+    assert throttle.threads_demoted >= 1
+    assert not getattr(throttle._thread_state, 'priority_applied', False)
@@ -0,0 +1,102 @@
+import errno
+import os
+
+import pytest
+
+import automation_toolkit
+from automation_toolkit import FileTransfer
+
+KB = 1024
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'src.bin'
+    path.write_bytes(os.urandom(200 * KB))
+    os.chmod(str(path), 0o640)
+    os.utime(str(path), (1_600_000_000, 1_600_000_000))
+    return path
+
+
+def fail_with(code):
+    def fail(*args, **kwargs):
+        raise OSError(code, os.strerror(code))
+    return fail
+
+
+def test_same_filesystem_move_is_a_rename(tmp_path, logger, source):
+    transfer = FileTransfer(logger)
+    ino = os.stat(str(source)).st_ino
+    assert transfer.move_file(str(source), str(tmp_path / 'dst.bin')) == 'rename'
+    assert os.stat(str(tmp_path / 'dst.bin')).st_ino == ino
+    assert transfer.stats['rename'] == 1
+
+
+def test_cross_device_move_copies_then_unlinks(tmp_path, logger, source, monkeypatch):
+    body = source.read_bytes()
+    monkeypatch.setattr(os, 'rename', fail_with(errno.EXDEV))
+    method = FileTransfer(logger).move_file(str(source), str(tmp_path / 'dst.bin'))
+    assert method != 'rename'
+    assert not source.exists()
+    assert (tmp_path / 'dst.bin').read_bytes() == body
+    assert sorted(os.listdir(str(tmp_path))) == ['dst.bin']
+
+
+@pytest.mark.parametrize('broken,expected', [
+    (('ioctl',), 'copy_file_range'),
+    (('ioctl', 'copy_file_range'), 'sendfile'),
+    (('ioctl', 'copy_file_range', 'sendfile'), 'buffered'),
+])
+def test_copy_falls_back_in_order(tmp_path, logger, source, monkeypatch, broken, expected):
+    if 'ioctl' in broken:
+        monkeypatch.setattr(automation_toolkit.fcntl, 'ioctl', fail_with(errno.EOPNOTSUPP))
+    if 'copy_file_range' in broken and hasattr(os, 'copy_file_range'):
+        monkeypatch.setattr(os, 'copy_file_range', fail_with(errno.EXDEV))
+    if 'sendfile' in broken:
+        monkeypatch.setattr(os, 'sendfile', fail_with(errno.EINVAL))
+    if expected == 'copy_file_range' and not hasattr(os, 'copy_file_range'):
+        expected = 'sendfile'
+    transfer = FileTransfer(logger, chunk_bytes=64 * KB)
+    assert transfer.copy_file(str(source), str(tmp_path / 'dst.bin')) == expected
+    assert (tmp_path / 'dst.bin').read_bytes() == source.read_bytes()
+    assert transfer.stats[expected] == 1
+
+
+def test_fallback_resumes_at_the_reached_offset(tmp_path, logger, source, monkeypatch):
+    monkeypatch.setattr(automation_toolkit.fcntl, 'ioctl', fail_with(errno.EOPNOTSUPP))
+    sendfile, calls = os.sendfile, []
+
+    def flaky_sendfile(out_fd, in_fd, offset, count):
+        calls.append(offset)
+        if len(calls) > 1:
+            raise OSError(errno.EINVAL, 'sendfile gave up')
+        return sendfile(out_fd, in_fd, offset, count)
+
+    monkeypatch.setattr(os, 'copy_file_range', fail_with(errno.EXDEV), raising=False)
+    monkeypatch.setattr(os, 'sendfile', flaky_sendfile)
+    transfer = FileTransfer(logger, chunk_bytes=64 * KB)
+    assert transfer.copy_file(str(source), str(tmp_path / 'dst.bin')) == 'buffered'
+    assert calls == [0, 64 * KB]
+    assert (tmp_path / 'dst.bin').read_bytes() == source.read_bytes()
+
+
+def test_copy_preserves_metadata(tmp_path, logger, source):
+    try:
+        os.setxattr(str(source), 'user.origin', b'test')
+        has_xattrs = True
+    except OSError:
+        has_xattrs = False
+    FileTransfer(logger).copy_file(str(source), str(tmp_path / 'dst.bin'))
+    src_st, dst_st = os.stat(str(source)), os.stat(str(tmp_path / 'dst.bin'))
+    assert dst_st.st_mode == src_st.st_mode
+    assert dst_st.st_mtime == src_st.st_mtime == 1_600_000_000
+    assert (dst_st.st_uid, dst_st.st_gid) == (src_st.st_uid, src_st.st_gid)
+    if has_xattrs:
+        assert os.getxattr(str(tmp_path / 'dst.bin'), 'user.origin') == b'test'
+
+
+def test_failed_copy_leaves_no_partial_file(tmp_path, logger, source, monkeypatch):
+    monkeypatch.setattr(automation_toolkit.fcntl, 'ioctl', fail_with(errno.EIO))
+    with pytest.raises(OSError):
+        FileTransfer(logger).copy_file(str(source), str(tmp_path / 'dst.bin'))
+    assert sorted(os.listdir(str(tmp_path))) == ['src.bin']
@@ -0,0 +1,47 @@
+import os
+
+import pytest
+from conftest import tree_files
+
+from automation_toolkit import FileManager, TrashBin
+
+
+@pytest.fixture
+def trash(tmp_path, logger):
+    return TrashBin(str(tmp_path / '.trash'), logger)
+
+
+def test_defer_moves_tree_into_trash(tmp_path, logger, make_file, trash):
+    for i in range(5):
+        make_file(str(tmp_path / 'victim' / f"d{i % 2}" / f"f{i}"), size=16)
+    results = FileManager(logger, trash=trash).remove_tree(str(tmp_path / 'victim'), defer=True)
+    assert results['dirs_removed'] == 1
+    assert not os.path.exists(str(tmp_path / 'victim'))
+    purged = trash.purge()
+    assert (purged['batches'], purged['files_removed'], purged['errors']) == (1, 5, 0)
+    assert os.listdir(str(tmp_path / '.trash')) == []
+
+
+def test_expired_files_are_trashed_and_the_trash_is_not_scanned(tmp_path, logger, make_file, trash):
+    make_file(str(tmp_path / 'logs' / 'old.log'), size=16, age_days=40)
+    make_file(str(tmp_path / 'logs' / 'new.log'), size=16)
+    file_mgr = FileManager(logger, trash=trash)
+    assert file_mgr.cleanup_old_files(str(tmp_path), days=30)['deleted'] == 1
+    assert tree_files(str(tmp_path / 'logs')) == {'new.log'}
+    assert [os.path.basename(path) for path in tree_files(str(tmp_path / '.trash'))] == ['1-old.log']
+    assert file_mgr.cleanup_old_files(str(tmp_path), days=30)['deleted'] == 0
+
+
+def test_purge_can_leave_the_current_batch(tmp_path, logger, make_file, trash):
+    make_file(str(tmp_path / 'old.log'), size=16)
+    assert trash.move_in(str(tmp_path / 'old.log'))
+    assert trash.purge(include_current=False)['batches'] == 0
+    assert len(tree_files(str(tmp_path / '.trash'))) == 1
+    assert trash.purge()['files_removed'] == 1
+    make_file(str(tmp_path / 'again.log'), size=16)
+    assert trash.move_in(str(tmp_path / 'again.log'))
+    assert len(tree_files(str(tmp_path / '.trash'))) == 1
+
+
+def test_move_in_reports_failures(tmp_path, trash):
+    assert not trash.move_in(str(tmp_path / 'missing'))
@@ -0,0 +1,142 @@
+import os
+
+import pytest
+from conftest import tree_files
+
+from automation_toolkit import FileManager, OperationJournal, ParallelTreeWalker, PathFilter, TreeWalker
+
+
+@pytest.fixture
+def sample_tree(tmp_path, make_file):
+    for top in ('a', 'b', 'c'):
+        for sub in ('x', 'y'):
+            for i in range(4):
+                make_file(str(tmp_path / top / sub / f"f{i}.log"), size=i * 1024, age_days=40 if i % 2 else 0)
+            make_file(str(tmp_path / top / sub / 'big.bin'), size=2 * 1024 * 1024)
+    make_file(str(tmp_path / 'a' / 'cache' / 'junk.pyc'), size=3 * 1024 * 1024, age_days=40)
+    os.symlink(str(tmp_path / 'b'), str(tmp_path / 'a' / 'link'))
+    return tmp_path
+
+
+def walk_paths(walker, root):
+    return {(os.path.relpath(entry.path, root), entry.is_dir) for entry in walker.walk(str(root))}
+
+
+def test_walk_yields_every_entry_without_following_symlinks(logger, sample_tree):
+    walker = TreeWalker(logger)
+    entries = {os.path.relpath(entry.path, str(sample_tree)): entry for entry in walker.walk(str(sample_tree))}
+    assert {path for path, entry in entries.items() if entry.is_file and not entry.is_symlink} == \
+        tree_files(str(sample_tree)) - {'a/link'}
+    assert entries['a/link'].is_symlink
+    assert not any(path.startswith('a/link/') for path in entries)
+    assert entries['a/x/big.bin'].size == 2 * 1024 * 1024
+    assert walker.stat_calls == sum(1 for entry in entries.values() if entry.is_file)
+
+
+def test_stat_files_off_issues_no_stats(logger, sample_tree):
+    walker = TreeWalker(logger, stat_files=False)
+    assert all(entry.stat is None for entry in walker.walk(str(sample_tree)))
+    assert walker.stat_calls == 0
+
+
+def test_skip_dirs_and_prune(logger, sample_tree):
+    walker = TreeWalker(logger, skip_dirs={str(sample_tree / 'c')})
+    seen = set()
+    for entry in walker.walk(str(sample_tree)):
+        if entry.is_dir and entry.name == 'x':
+            walker.prune()
+        seen.add(os.path.relpath(entry.path, str(sample_tree)))
+    assert 'a/x' in seen
+    assert not any('/x/' in path or path.startswith('c') for path in seen)
+
+
+def test_scan_dir_lists_one_level(logger, sample_tree):
+    names = {entry.name for entry in TreeWalker(logger).scan_dir(str(sample_tree / 'a'))}
+    assert names == {'x', 'y', 'cache', 'link'}
+
+
+def test_find_large_files(logger, sample_tree):
+    found = {os.path.relpath(match['path'], str(sample_tree))
+             for match in FileManager(logger).find_large_files(str(sample_tree), 1)}
+    assert found == {f"{top}/{sub}/big.bin" for top in 'abc' for sub in 'xy'} | {'a/cache/junk.pyc'}
+
+
+def test_cleanup_old_files(logger, sample_tree):
+    results = FileManager(logger).cleanup_old_files(str(sample_tree), days=30)
+    assert results['errors'] == 0
+    assert results['deleted'] == 13
+    remaining = tree_files(str(sample_tree))
+    assert 'a/cache/junk.pyc' not in remaining
+    assert {f"a/x/f{i}.log" for i in (0, 2)} <= remaining
+    assert not {f"a/x/f{i}.log" for i in (1, 3)} & remaining
+
+
+def test_parallel_walk_matches_serial(logger, sample_tree):
+    serial = walk_paths(TreeWalker(logger), sample_tree)
+    parallel = walk_paths(ParallelTreeWalker(logger, workers=4), sample_tree)
+    assert serial == parallel
+    assert not any(path.startswith('a/link/') for path, _ in parallel)
+
+
+def test_parallel_walker_honours_skip_dirs_and_prune(logger, sample_tree):
+    walker = ParallelTreeWalker(logger, workers=4, skip_dirs={str(sample_tree / 'c')})
+    seen = set()
+    for entry in walker.walk(str(sample_tree)):
+        if entry.is_dir and entry.name == 'x':
+            walker.prune()
+        seen.add(os.path.relpath(entry.path, str(sample_tree)))
+    assert 'b/x' in seen
+    assert not any('/x/' in path or path.startswith('c') for path in seen)
+
+
+def test_parallel_walker_rejects_post_order_callbacks(logger, sample_tree):
+    with pytest.raises(ValueError):
+        list(ParallelTreeWalker(logger).walk(str(sample_tree), on_dir_exit=lambda path, remaining: False))
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_scans_match_across_walkers(logger, sample_tree, workers):
+    file_mgr = FileManager(logger, workers=workers)
+    found = {os.path.relpath(match['path'], str(sample_tree)) for match in file_mgr.find_large_files(str(sample_tree), 1)}
+    assert found == {f"{top}/{sub}/big.bin" for top in 'abc' for sub in 'xy'} | {'a/cache/junk.pyc'}
+    assert file_mgr.cleanup_old_files(str(sample_tree), days=30)['deleted'] == 13
+
+
+def test_sharded_scans_match_serial(logger, sample_tree, make_file):
+    make_file(str(sample_tree / 'top-level.bin'), size=2 * 1024 * 1024, age_days=40)
+    serial, sharded = FileManager(logger), FileManager(logger, processes=2)
+    assert sorted(match['path'] for match in sharded.find_large_files(str(sample_tree), 1)) == \
+        sorted(match['path'] for match in serial.find_large_files(str(sample_tree), 1))
+    results = sharded.cleanup_old_files(str(sample_tree), days=30)
+    assert (results['deleted'], results['errors']) == (14, 0)
+    assert not any(path.endswith(('f1.log', 'f3.log', '.pyc', 'top-level.bin'))
+                   for path in tree_files(str(sample_tree)))
+
+
+def test_sharding_steps_aside_for_journaled_runs(tmp_path, logger):
+    journal = OperationJournal(str(tmp_path / 'journal'), logger)
+    assert FileManager(logger, processes=2)._can_shard()
+    assert not FileManager(logger, processes=2, journal=journal)._can_shard()
+    journal.close()
+
+
+def test_skip_dirs_and_filter_apply_to_both_walkers(logger, sample_tree):
+    path_filter = PathFilter(['cache', '*.log'])
+    for walker_cls in (TreeWalker, ParallelTreeWalker):
+        walker = walker_cls(logger, skip_dirs={str(sample_tree / 'c')}, path_filter=path_filter)
+        paths = walk_paths(walker, sample_tree)
+        assert not any(path.startswith(('c/', 'a/cache')) or path.endswith('.log') for path, _ in paths)
+        assert ('b/x/big.bin', False) in paths
+
+
+def test_includes_keep_descending(logger, sample_tree):
+    walker = TreeWalker(logger, path_filter=PathFilter(includes=['*.bin']))
+    files = {path for path, is_dir in walk_paths(walker, sample_tree) if not is_dir}
+    assert files == {f"{top}/{sub}/big.bin" for top in 'abc' for sub in 'xy'}
+
+
+def test_filter_is_honoured_by_sharded_scan(logger, sample_tree):
+    file_mgr = FileManager(logger, processes=2, path_filter=PathFilter(['cache']))
+    found = {os.path.relpath(match['path'], str(sample_tree)) for match in file_mgr.find_large_files(str(sample_tree), 1)}
+    assert 'a/cache/junk.pyc' not in found
+    assert len(found) == 6